@@ -0,0 +1,169 @@
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+from . import config, models, schemas
+from .cache import product_cache
+from .crud import (
+    PRODUCT_ROW_COLUMNS, _apply_product_update, _cached_listing_entry, _cached_product_entry, _customer_orders_query,
+    _filter_orders, _filter_products, _listing_cache_key, _order_loaders, _order_payload, _payment_payload,
+    _product_listing_query, _product_payload, _product_prices_query, _replayed_payment, _reserve_stock, _stock_conflict,
+    _stock_payload, record_event, sales_rollup,
+)
+
+# Async mirrors of the functions in crud.py. Behaviour and error responses
+# must stay identical so DB_MODE can be switched without clients noticing.
+
+# ---------------------------- Product CRUD ---------------------------- #
+
+async def create_product(db: AsyncSession, product: schemas.ProductCreate):
+    new_product = models.Product(**product.model_dump())
+    db.add(new_product)
+    await db.flush()
+    record_event(db, "product.created", new_product.id, _product_payload(new_product))
+    await db.commit()
+    await db.refresh(new_product)
+    product_cache.invalidate_listings()
+    return new_product
+
+async def get_all_products(db: AsyncSession, filters: Optional[schemas.ProductFilters] = None,
+                           limit: int = config.DEFAULT_PAGE_SIZE, cursor: Optional[int] = None):
+    return (await db.execute(_product_listing_query(filters, limit, cursor))).all()
+
+async def iter_products(db: AsyncSession, filters: Optional[schemas.ProductFilters] = None):
+    query = _filter_products(select(*PRODUCT_ROW_COLUMNS), filters).order_by(models.Product.id)
+    result = await db.stream(query.execution_options(yield_per=config.STREAM_BATCH_SIZE))
+    async for row in result:
+        yield row
+
+async def get_product(db: AsyncSession, product_id: int):
+    product = await db.get(models.Product, product_id)
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found.")
+    return product
+
+async def get_product_prices(db: AsyncSession, product_ids: List[int]):
+    return [row._asdict() for row in await db.execute(_product_prices_query(product_ids))]
+
+async def get_product_cached(db: AsyncSession, product_id: int, refresh: bool = False):
+    async def load():
+        return _cached_product_entry(await get_product(db, product_id))
+    return await product_cache.aget_product(product_id, load, refresh)
+
+async def get_all_products_cached(db: AsyncSession, filters: Optional[schemas.ProductFilters] = None,
+                                  limit: int = config.DEFAULT_PAGE_SIZE, cursor: Optional[int] = None,
+                                  refresh: bool = False):
+    async def load():
+        return _cached_listing_entry(await get_all_products(db, filters, limit, cursor), limit)
+    return await product_cache.aget_listing(_listing_cache_key(filters, limit, cursor), load, refresh)
+
+async def update_product(db: AsyncSession, product_id: int, product_data: schemas.ProductCreate):
+    product = await get_product(db, product_id)
+    _apply_product_update(product, product_data)
+    await db.flush()
+    record_event(db, "product.updated", product_id, _product_payload(product))
+    await db.commit()
+    product_cache.invalidate_product(product_id)
+    await db.refresh(product)
+    return product
+
+async def mark_product_sold(db: AsyncSession, product_id: int):
+    product = await get_product(db, product_id)
+    product.status = "Sold"
+    await db.flush()
+    record_event(db, "product.updated", product_id, _product_payload(product))
+    await db.commit()
+    product_cache.invalidate_product(product_id)
+    await db.refresh(product)
+    return product
+
+async def delete_product(db: AsyncSession, product_id: int):
+    product = await get_product(db, product_id)
+    await db.delete(product)
+    record_event(db, "product.deleted", product_id, {"id": product_id})
+    await db.commit()
+    product_cache.invalidate_product(product_id)
+    return
+
+# ---------------------------- Order CRUD ---------------------------- #
+
+async def create_order(db: AsyncSession, order: schemas.OrderCreate):
+    reserved = (await db.execute(_reserve_stock(order.product_id, order.quantity))).first()
+    if reserved is None:
+        await db.rollback()
+        raise _stock_conflict(await db.get(models.Product, order.product_id))
+
+    new_order = models.Order(**order.model_dump(), total_price=round(reserved.price * order.quantity, 2))
+    db.add(new_order)
+    await db.execute(*sales_rollup(db.get_bind().dialect.name, [(order.product_id, order.quantity, new_order.total_price)]))
+    await db.flush()
+    record_event(db, "product.stock_changed", order.product_id, _stock_payload(order.product_id, reserved))
+    record_event(db, "order.created", new_order.id, _order_payload(new_order))
+    await db.commit()
+    product_cache.invalidate_product(order.product_id)
+    await db.refresh(new_order)
+    return new_order
+
+async def get_all_orders(db: AsyncSession, filters: Optional[schemas.OrderFilters] = None,
+                         limit: int = config.DEFAULT_PAGE_SIZE, cursor: Optional[int] = None, expand=()):
+    query = _filter_orders(select(models.Order), filters).options(*_order_loaders(expand))
+    if cursor is not None:
+        query = query.filter(models.Order.id > cursor)
+    query = query.order_by(models.Order.id).limit(min(limit, config.MAX_PAGE_SIZE))
+    return (await db.scalars(query)).unique().all()
+
+async def get_customer_orders(db: AsyncSession, customer_id: int, limit: int = config.DEFAULT_PAGE_SIZE,
+                              cursor: Optional[int] = None, expand=()):
+    return (await db.scalars(_customer_orders_query(customer_id, limit, cursor, expand))).unique().all()
+
+async def iter_orders(db: AsyncSession, filters: Optional[schemas.OrderFilters] = None):
+    query = _filter_orders(select(models.Order), filters).order_by(models.Order.id)
+    result = await db.stream_scalars(query.execution_options(yield_per=config.STREAM_BATCH_SIZE))
+    async for order in result:
+        yield order
+
+async def get_order(db: AsyncSession, order_id: int, expand=()):
+    order = await db.get(models.Order, order_id, options=_order_loaders(expand))
+    if not order:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found.")
+    return order
+
+# ---------------------------- Payment CRUD ---------------------------- #
+
+async def get_payment_by_key(db: AsyncSession, idempotency_key: str):
+    return await db.scalar(select(models.Payment).where(models.Payment.idempotency_key == idempotency_key))
+
+async def create_payment(db: AsyncSession, payment_data: schemas.PaymentRequest, idempotency_key: Optional[str] = None):
+    if idempotency_key:
+        existing = await get_payment_by_key(db, idempotency_key)
+        if existing:
+            return _replayed_payment(existing, payment_data), False
+    await get_order(db, payment_data.order_id)
+
+    payment = models.Payment(
+        order_id=payment_data.order_id,
+        amount_paid=payment_data.amount,
+        payment_method=payment_data.payment_method,
+        status=models.PaymentStatusEnum.pending,
+        idempotency_key=idempotency_key,
+    )
+    db.add(payment)
+    try:
+        await db.flush()
+        record_event(db, "payment.created", payment.id, _payment_payload(payment))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        existing = await get_payment_by_key(db, idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise
+        return _replayed_payment(existing, payment_data), False
+    await db.refresh(payment)
+    return payment, True
+
+async def get_payment(db: AsyncSession, payment_id: int):
+    payment = await db.get(models.Payment, payment_id)
+    if not payment:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Payment not found.")
+    return payment
@@ -0,0 +1,47 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from . import config, pool_metrics
+from .config import DATABASE_URL
+from .database import engine_options
+from .replicas import ReplicaRouter
+
+# Async drivers used in place of the sync ones from DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    """Swap the driver in a sync DATABASE_URL for its asyncio counterpart."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+# Create the async DB Connection
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, "async", AsyncAdaptedQueuePool))
+pool_metrics.instrument("async", async_engine.sync_engine)
+
+async_replica_engines = []
+for index, replica_url in enumerate(config.DATABASE_REPLICA_URLS):
+    replica_url = to_async_url(replica_url)
+    async_replica_engines.append(create_async_engine(
+        replica_url, **engine_options(replica_url, f"async-replica-{index}", AsyncAdaptedQueuePool)))
+    pool_metrics.instrument(f"async-replica-{index}", async_replica_engines[-1].sync_engine)
+async_read_router = ReplicaRouter(async_engine, async_replica_engines)
+
+# expire_on_commit=False: attributes stay loaded after commit, so responses
+# can be serialized without an implicit (and illegal) lazy load.
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+
+#Dependency to get async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
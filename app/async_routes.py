@@ -0,0 +1,184 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from . import async_crud, config, crud, metrics, payments, replicas, schemas, snapshot
+from .async_database import AsyncSessionLocal, async_read_router, get_async_db
+from .routes import (_conditional_response, _json_body, _order_view, _orm_json, _product_row_json,
+                     _set_next_cursor, order_expand, order_filters, product_filters, product_ids)
+
+# Served instead of the matching routes in routes.py when DB_MODE=async.
+# Paths, response models and status codes must match the sync router.
+router = APIRouter()
+
+def sync_fallback_router(sync_router: APIRouter) -> APIRouter:
+    """Routes of `sync_router` that have no async counterpart here, so they keep being served."""
+    ported = {(route.path_format, method) for route in router.routes for method in route.methods}
+    fallback = APIRouter()
+    fallback.routes.extend(
+        route for route in sync_router.routes
+        if not any((route.path_format, method) in ported for method in route.methods)
+    )
+    return fallback
+
+async def _open_read_session(request: Request):
+    return await replicas.open_async_read_session(
+        async_read_router, AsyncSessionLocal, replicas.pinned_to_primary(request.cookies))
+
+async def get_async_read_db(request: Request):
+    """Same as routes.get_read_db for AsyncSession."""
+    async with await _open_read_session(request) as db:
+        yield db
+
+def _ndjson_stream(iter_rows, to_json, filters, open_session):
+    # Same as routes._ndjson_stream: the export owns its session for the lifetime of the body.
+    async def generate():
+        async with await open_session() as db:
+            async for row in iter_rows(db, filters):
+                yield to_json(row) + b"\n"
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# ------------------------------------------------------
+# Product Routes
+# ------------------------------------------------------
+@router.get("/products", response_model=List[schemas.ProductResponse], tags=["Products"])
+async def get_products(
+    request: Request,
+    response: Response,
+    filters: schemas.ProductFilters = Depends(product_filters),
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last product id of the previous page"),
+    stream: bool = Query(False, description="Stream every matching product as NDJSON"),
+):
+    """Retrieve a page of products. The next page's cursor is returned in the X-Next-Cursor header."""
+    if stream:
+        return _ndjson_stream(async_crud.iter_products, _product_row_json, filters, lambda: _open_read_session(request))
+    pinned = replicas.pinned_to_primary(request.cookies)
+    # Off the event loop: a mapping swap or a long page should not stall other requests
+    page = None if pinned else await run_in_threadpool(snapshot.catalog.listing, filters, limit, cursor)
+    if page is None:
+        async with await _open_read_session(request) as db:
+            page = await async_crud.get_all_products_cached(db, filters, limit, cursor, pinned)
+    not_modified = _conditional_response(request, response, page["etag"])
+    if not_modified:
+        return not_modified
+    _set_next_cursor(response, page["next_cursor"])
+    return _json_body(page["body"], response)
+
+@router.get("/products/prices", response_model=List[schemas.ProductPrice], tags=["Products"])
+async def get_product_prices(request: Request, ids: List[int] = Depends(product_ids)):
+    """Current price, stock and status of several products, e.g. to price a cart. Unknown ids are left out."""
+    pinned = replicas.pinned_to_primary(request.cookies)
+    prices = None if pinned else await run_in_threadpool(snapshot.catalog.prices, ids)
+    if prices is None:
+        async with await _open_read_session(request) as db:
+            prices = await async_crud.get_product_prices(db, ids)
+    return prices
+
+@router.get("/products/{product_id}", response_model=schemas.ProductResponse, tags=["Products"])
+async def get_product(product_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    """Retrieve a product by its ID. Honours If-None-Match with a 304."""
+    entry = await async_crud.get_product_cached(db, product_id, replicas.pinned_to_primary(request.cookies))
+    return _conditional_response(request, response, entry["etag"]) or entry["product"]
+
+@router.post("/products", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED, tags=["Products"])
+async def create_product(product: schemas.ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a new product."""
+    return await async_crud.create_product(db, product)
+
+@router.put("/products/{product_id}", response_model=schemas.ProductResponse, tags=["Products"])
+async def update_product(product_id: int, product: schemas.ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    """Update an existing product."""
+    return await async_crud.update_product(db, product_id, product)
+
+@router.put("/products/{product_id}/status", response_model=schemas.ProductResponse, tags=["Products"])
+async def mark_product_sold(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Mark a product as sold."""
+    return await async_crud.mark_product_sold(db, product_id)
+
+@router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Products"])
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Delete a product."""
+    await async_crud.delete_product(db, product_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# ------------------------------------------------------
+# Order Routes
+# ------------------------------------------------------
+@router.post("/orders", response_model=schemas.OrderResponse, status_code=status.HTTP_201_CREATED, tags=["Orders"])
+async def create_order(order_data: schemas.OrderCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a new order."""
+    return await async_crud.create_order(db, order_data)
+
+@router.get("/orders", response_model=List[schemas.OrderDetail], response_model_exclude_unset=True, tags=["Orders"])
+async def get_orders(
+    request: Request,
+    response: Response,
+    filters: schemas.OrderFilters = Depends(order_filters),
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last order id of the previous page"),
+    stream: bool = Query(False, description="Stream every matching order as NDJSON"),
+    expand: set = Depends(order_expand),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Retrieve a page of orders. The next page's cursor is returned in the X-Next-Cursor header."""
+    if stream:
+        if expand:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="expand is not supported with stream=true.")
+        return _ndjson_stream(async_crud.iter_orders, _orm_json(schemas.OrderResponse), filters, lambda: _open_read_session(request))
+    orders = await async_crud.get_all_orders(db, filters, limit, cursor, expand)
+    _set_next_cursor(response, crud.next_cursor(orders, limit))
+    return [_order_view(order, expand) for order in orders]
+
+@router.get("/orders/{order_id}", response_model=schemas.OrderDetail, response_model_exclude_unset=True, tags=["Orders"])
+async def get_order(order_id: int, expand: set = Depends(order_expand), db: AsyncSession = Depends(get_async_read_db)):
+    """Retrieve an order by its ID."""
+    return _order_view(await async_crud.get_order(db, order_id, expand), expand)
+
+@router.get("/customers/{customer_id}/orders", response_model=List[schemas.OrderDetail],
+            response_model_exclude_unset=True, tags=["Orders"])
+async def get_customer_orders(
+    customer_id: int,
+    response: Response,
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last order id of the previous page"),
+    expand: set = Depends(order_expand),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """A customer's order history, newest first. The next page's cursor is returned in the X-Next-Cursor header."""
+    orders = await async_crud.get_customer_orders(db, customer_id, limit, cursor, expand)
+    _set_next_cursor(response, crud.next_cursor(orders, limit))
+    return [_order_view(order, expand) for order in orders]
+
+# ------------------------------------------------------
+# Payment Routes
+# ------------------------------------------------------
+@router.post("/payments", response_model=schemas.PaymentResponse, status_code=status.HTTP_201_CREATED, tags=["Payments"])
+async def process_payment(
+    payment: schemas.PaymentRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255, description="Retries with the same key return the original payment"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Record a payment as pending and queue it for verification. Poll GET /payments/{id} for the outcome."""
+    record, created = await async_crud.create_payment(db, payment, idempotency_key)
+    if created:
+        payments.worker.enqueue(record.id)
+    else:
+        response.status_code = status.HTTP_200_OK
+    return record
+
+@router.get("/payments/{payment_id}", response_model=schemas.PaymentResponse, tags=["Payments"])
+async def get_payment(payment_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """Retrieve a payment and its current status."""
+    return await async_crud.get_payment(db, payment_id)
+
+# ------------------------------------------------------
+# Monitoring Routes
+# ------------------------------------------------------
+@router.get("/replica-stats", tags=["Monitoring"], dependencies=[Depends(metrics.require_token)])
+async def get_replica_stats():
+    """Configured read replicas and which of them are currently skipped as unhealthy."""
+    return async_read_router.stats()
@@ -0,0 +1,163 @@
+"""Per-process read-through cache for product lookups and listing pages.
+
+Each worker process has its own cache, and a write only invalidates the
+cache of the worker that handled it: the other workers keep serving what
+they cached before the write for up to CACHE_TTL_SECONDS (30 by default).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from . import config
+
+# Sentinel returned by backends on a miss, so a cached None/[] still counts as a hit
+MISSING = object()
+
+
+class CacheBackend:
+    """Storage used by ProductCache. Values are JSON-compatible, so a shared cache can serialize them."""
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryCache(CacheBackend):
+    """Per-process cache with a TTL on every entry and LRU eviction past `max_entries`."""
+
+    def __init__(self, max_entries: int = config.CACHE_MAX_ENTRIES, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        expires_at = self._clock() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ProductCache:
+    """Read-through cache for product lookups and listing pages.
+
+    Listing keys embed a generation number; any product write bumps it, which
+    orphans every cached page at once without having to enumerate keys. The
+    generation is kept on the cache, not in the backend, so LRU eviction can't
+    reset it and bring back pages from before a write.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = config.CACHE_TTL_SECONDS, enabled: bool = config.CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _read_through(self, key: str, loader, refresh: bool = False):
+        """`refresh` skips the lookup and overwrites the entry, e.g. for a client that must see its own write."""
+        if not self.enabled:
+            return loader()
+        value = MISSING if refresh else self.backend.get(key)
+        if value is not MISSING:
+            self._count(hit=True)
+            return value
+        self._count(hit=False)
+        value = loader()
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    async def _aread_through(self, key: str, loader, refresh: bool = False):
+        # Same as _read_through for the async CRUD path, where the loader is a coroutine function
+        if not self.enabled:
+            return await loader()
+        value = MISSING if refresh else self.backend.get(key)
+        if value is not MISSING:
+            self._count(hit=True)
+            return value
+        self._count(hit=False)
+        value = await loader()
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    def get_product(self, product_id: int, loader, refresh: bool = False):
+        return self._read_through(f"products:{product_id}", loader, refresh)
+
+    def get_listing(self, params: str, loader, refresh: bool = False):
+        return self._read_through(f"products:list:{self._generation}:{params}", loader, refresh)
+
+    async def aget_product(self, product_id: int, loader, refresh: bool = False):
+        return await self._aread_through(f"products:{product_id}", loader, refresh)
+
+    async def aget_listing(self, params: str, loader, refresh: bool = False):
+        return await self._aread_through(f"products:list:{self._generation}:{params}", loader, refresh)
+
+    def invalidate_product(self, product_id: int):
+        self.backend.delete(f"products:{product_id}")
+        self.invalidate_listings()
+
+    def invalidate_listings(self):
+        with self._lock:
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+product_cache = ProductCache(InMemoryCache())
+
+
+def configure(backend: CacheBackend):
+    """Swap the product cache backend, e.g. for a cache shared between workers."""
+    product_cache.backend = backend
@@ -6,4 +6,167 @@ load_dotenv()
 
 
 #safely fetches the value from .env
-DATABASE_URL = os.getenv("DATABASE_URL")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+def _routes(spec: str):
+    """Parse "METHOD /path, ..." into a set of route keys."""
+    return {route.strip() for route in spec.split(",") if route.strip()}
+
+def _route_costs(spec: str):
+    """Parse "METHOD /path=cost, ..." into {"METHOD /path": cost}."""
+    rules = (rule.rsplit("=", 1) for rule in spec.split(",") if rule.strip())
+    return {route.strip(): float(cost) for route, cost in rules}
+
+# ---------------------------- Listing / Pagination ---------------------------- #
+# Page size used when a client does not pass ?limit=
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+# Hard cap on ?limit= so a single request can never pull the whole table
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+# Rows fetched per round-trip when streaming NDJSON exports
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# ---------------------------- Database Mode ---------------------------- #
+# "sync" serves requests from the threadpool with psycopg2 sessions,
+# "async" serves them on the event loop with AsyncSession (asyncpg / aiosqlite)
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+# ---------------------------- Read Replicas ---------------------------- #
+# Comma-separated URLs of read replicas; read-only routes are spread across them
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Seconds an unreachable replica is skipped before it is tried again
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# After a write, the client's reads stay on the primary this long (covers replica and snapshot lag)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# ---------------------------- Connection Pool ---------------------------- #
+# Applied to the Postgres engines; SQLite keeps SQLAlchemy's default pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before giving up with a TimeoutError
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections older than this many seconds are replaced on checkout (-1 disables)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Ping connections on checkout so ones killed by a Postgres restart are replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Server-side statement_timeout in milliseconds (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+# ---------------------------- Startup ---------------------------- #
+# Open the whole pool and run the hot queries on each connection before reporting ready
+DB_POOL_PREFILL = os.getenv("DB_POOL_PREFILL", "true").lower() in ("1", "true", "yes")
+# Longest pause between warm-up attempts while the database is unreachable or not migrated yet
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", "5"))
+# GET /health/ready reports 503 when a database round-trip takes longer than this
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+
+# ---------------------------- Product Cache ---------------------------- #
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Upper bound on staleness for entries a write did not invalidate, e.g. in other worker processes
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+# Least recently used entries are evicted past this many
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+# ---------------------------- Catalog Snapshot ---------------------------- #
+# Memory-mapped catalog shared by every worker on a node and written by one
+# refresher (python -m app.snapshot); GET /api/products and price lookups are
+# served from it. Empty disables the snapshot
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "")
+# The refresher checks the outbox for product changes this often
+CATALOG_SNAPSHOT_REFRESH_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_REFRESH_SECONDS", "1"))
+# Workers go back to the database when the refresher has not checked in for this long
+CATALOG_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE_SECONDS", "10"))
+
+# ---------------------------- Bulk Writes ---------------------------- #
+# Rows written per transaction by the bulk endpoints
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+# Largest payload a single bulk request may carry
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+
+# ---------------------------- Product Search ---------------------------- #
+# Upper bounds of the price facet buckets; the last bucket is open-ended
+SEARCH_PRICE_BUCKETS = [float(bound) for bound in os.getenv("SEARCH_PRICE_BUCKETS", "10,25,50,100,250").split(",")]
+
+# ---------------------------- Metrics & Logging ---------------------------- #
+LOG_LEVEL = os.getenv("LOG_LEVEL", "ERROR").upper()
+# Route latency histograms, SQL profiling and the /metrics endpoint
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Fraction of requests that get per-request SQL profiling
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "0.01"))
+# Also send sampled requests their profile as a Server-Timing header. Off by default, since it tells any
+# client how long its request spent in the database; requests carrying METRICS_TOKEN always get one
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+# Bearer token required by /metrics and the monitoring routes; unset leaves them open (e.g. on a private network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Sampled requests running more SQL statements than this are flagged as likely N+1
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "20"))
+
+# ---------------------------- Analytics ---------------------------- #
+# Days covered by an analytics report when the client gives no start date
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "30"))
+# Longest date range a single report may span
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "366"))
+
+# ---------------------------- Payments ---------------------------- #
+# Background threads verifying pending payments with the provider
+PAYMENT_WORKERS = int(os.getenv("PAYMENT_WORKERS", "4"))
+# Provider class as "module:Class"; it is constructed with no arguments
+PAYMENT_PROVIDER = os.getenv("PAYMENT_PROVIDER", "app.payments:FakePaymentProvider")
+# How long a claimed payment is left to its worker before another process may retry it; longer than a provider call
+PAYMENT_LEASE_SECONDS = float(os.getenv("PAYMENT_LEASE_SECONDS", "60"))
+# Fake provider used until a real one is wired in (and by tests/benchmarks)
+PAYMENT_PROVIDER_LATENCY_MS = float(os.getenv("PAYMENT_PROVIDER_LATENCY_MS", "200"))
+PAYMENT_PROVIDER_FAILURE_RATE = float(os.getenv("PAYMENT_PROVIDER_FAILURE_RATE", "0.0"))
+
+# ---------------------------- HTTP Caching & Compression ---------------------------- #
+# Cache-Control sent with product reads; clients revalidate with the ETag after max-age
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=10")
+# "gzip", "br" (needs the optional brotli-asgi package; falls back to gzip) or "off"
+COMPRESSION = os.getenv("COMPRESSION", "gzip").lower()
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# gzip level (1-9) or brotli quality (0-11); higher squeezes a little more at a much higher CPU cost per response
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "5"))
+
+# ---------------------------- Rate Limiting & Load Shedding ---------------------------- #
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Token bucket per client (a known X-API-Key, else IP): refill rate in tokens per second, and bucket size.
+# The default in-memory buckets are per worker process, so each worker allows this much
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40"))
+# Tokens charged per request; unlisted routes cost 1. Paths match exactly, so lookups by id stay at 1
+RATE_LIMIT_ROUTE_COSTS = _route_costs(os.getenv(
+    "RATE_LIMIT_ROUTE_COSTS",
+    "GET /api/products=5, GET /api/orders=5, GET /api/products/search=3, "
+    "POST /api/products/bulk=10, PUT /api/products/bulk=10, POST /api/orders/bulk=5",
+))
+# API keys that get a bucket of their own. Any other X-API-Key is ignored and the client is limited by IP,
+# so inventing keys neither buys tokens nor floods out real clients' buckets
+RATE_LIMIT_API_KEYS = {key.strip() for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()}
+# Addresses or networks of reverse proxies in front of the app (e.g. "10.0.0.0/8"). Only for requests from
+# these is X-Forwarded-For read: the client is its rightmost address that is not a trusted proxy.
+# Without any, the client is the peer address and X-Forwarded-For is ignored, as it can be forged
+TRUSTED_PROXIES = [proxy.strip() for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()]
+# Buckets kept by the in-memory backend; least recently seen clients are dropped past this
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+# Shed requests with 503 once this many are in flight in one process (0 disables)
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "200"))
+# ... or once the p95 DB pool checkout wait over the last LOAD_SHED_WINDOW_SECONDS exceeds this (0 disables)
+LOAD_SHED_MAX_POOL_WAIT_MS = float(os.getenv("LOAD_SHED_MAX_POOL_WAIT_MS", "250"))
+LOAD_SHED_WINDOW_SECONDS = float(os.getenv("LOAD_SHED_WINDOW_SECONDS", "5"))
+# Checkout traffic is never shed; it still counts towards the in-flight total
+LOAD_SHED_EXEMPT = _routes(os.getenv("LOAD_SHED_EXEMPT", "POST /api/orders, POST /api/payments"))
+# Long-lived requests (event long-polls) and health probes are neither shed nor counted as in flight
+LOAD_SHED_IGNORE = _routes(os.getenv("LOAD_SHED_IGNORE", "GET /api/events, GET /health/live, GET /health/ready"))
+
+# ---------------------------- Change Events (Outbox) ---------------------------- #
+# Events the relay publishes per transaction
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+# Seconds the relay sleeps when it finds nothing to publish
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", "0.2"))
+# Published events older than this are pruned; consumers further behind must re-list
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "168"))
+# Longest ?wait= a GET /api/events long-poll may hold the connection for
+EVENTS_MAX_WAIT_SECONDS = float(os.getenv("EVENTS_MAX_WAIT_SECONDS", "30"))
+# Waiting consumers re-check the table this often, for events relayed by other processes
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1"))
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pytest
+
+# app.database builds its engines from DATABASE_URL on import, and .env never
+# overrides a variable that is already set: point the app at a throwaway file
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'routes.db')}"
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """An empty schema in the app's database; rate limits off, the outbox relay not started."""
+    from app import config, models, outbox
+    from app.cache import product_cache
+    from app.database import engine
+
+    monkeypatch.setattr(config, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(outbox.relay, "start", lambda: None)  # events stay unrelayed; tests read the tables
+    models.Base.metadata.create_all(bind=engine)
+    product_cache.backend.clear()
+    yield engine
+    models.Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def serve(database, monkeypatch):
+    """serve(mode) runs the whole app (middleware, error handlers, routers) in that DB_MODE."""
+    from fastapi.testclient import TestClient
+
+    from app import config, main
+
+    @contextmanager
+    def serve(mode: str):
+        monkeypatch.setattr(config, "DB_MODE", mode)
+        with TestClient(main.create_app()) as client:
+            # Warm-up runs in the background and holds connections until it is done
+            deadline = time.monotonic() + 10
+            while not client.app.state.readiness.ready and time.monotonic() < deadline:
+                time.sleep(0.01)
+            yield client
+    return serve
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, serve):
+    with serve(request.param) as client:
+        yield client
@@ -1,18 +1,122 @@
-from sqlalchemy.orm import Session
+import hashlib
+import logging
+from collections import Counter
+from datetime import date
+from typing import List, Optional
+from sqlalchemy import and_, bindparam, case, column, delete, func, insert, literal, select, table, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, joinedload, selectinload
 from fastapi import HTTPException, status
-from . import models, schemas
+from . import config, models, schemas
+from .cache import product_cache
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Outbox Events ---------------------------- #
+# Every write appends its change events in its own transaction, so consumers
+# of GET /api/events see exactly the changes that committed. Payloads are the
+# JSON shapes the API returns, plus the row version for products.
+
+def record_event(db: Session, event_type: str, entity_id: int, payload: dict):
+    db.add(models.OutboxEvent(topic=event_type.split(".")[0], type=event_type, entity_id=entity_id, payload=payload))
+
+def record_events(db: Session, event_type: str, payloads: List[dict]):
+    """record_event for many rows in one multi-row INSERT."""
+    db.execute(insert(models.OutboxEvent), [
+        {"topic": event_type.split(".")[0], "type": event_type, "entity_id": payload["id"], "payload": payload}
+        for payload in payloads
+    ])
+
+def _product_payload(product: models.Product):
+    return {**_serialize_product(product), "version": product.version}
+
+def _product_row_payload(row):
+    return {**schemas.product_row_json.dump_python(product_row(row), mode="json"), "version": row.version}
+
+def _stock_payload(product_id: int, reserved):
+    """product.stock_changed payload from the row _reserve_stock returned."""
+    return {"id": product_id, "quantity": reserved.quantity, "status": reserved.status, "version": reserved.version}
+
+def _order_payload(order):
+    return schemas.OrderResponse.model_validate(order, from_attributes=True).model_dump(mode="json")
+
+def _payment_payload(payment: models.Payment):
+    return schemas.PaymentResponse.model_validate(payment, from_attributes=True).model_dump(mode="json")
+
+def get_events(db: Session, after: int = 0, topics: Optional[List[str]] = None, limit: int = config.DEFAULT_PAGE_SIZE):
+    """Relayed events past the `after` cursor, in stream order."""
+    query = select(models.OutboxEvent).where(models.OutboxEvent.sequence > after)
+    if topics:
+        query = query.where(models.OutboxEvent.topic.in_(topics))
+    query = query.order_by(models.OutboxEvent.sequence).limit(min(limit, config.MAX_PAGE_SIZE))
+    return db.scalars(query).all()
 
 # ---------------------------- Product CRUD ---------------------------- #
 
 def create_product(db: Session, product: schemas.ProductCreate):
-    new_product = models.Product(**product.dict())
+    new_product = models.Product(**product.model_dump())
     db.add(new_product)
+    db.flush()
+    record_event(db, "product.created", new_product.id, _product_payload(new_product))
     db.commit()
     db.refresh(new_product)
+    product_cache.invalidate_listings()
     return new_product
 
-def get_all_products(db: Session):
-    return db.query(models.Product).all()
+def _filter_products(query, filters: Optional[schemas.ProductFilters]):
+    if filters is None:
+        return query
+    if filters.status is not None:
+        query = query.filter(models.Product.status == filters.status)
+    if filters.min_price is not None:
+        query = query.filter(models.Product.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(models.Product.price <= filters.max_price)
+    if filters.created_after is not None:
+        query = query.filter(models.Product.created_at >= filters.created_after)
+    if filters.created_before is not None:
+        query = query.filter(models.Product.created_at < filters.created_before)
+    return query
+
+# Listings select these columns as plain rows instead of loading Product
+# entities; the order matches schemas.ProductRow, with version appended for ETags.
+PRODUCT_ROW_COLUMNS = tuple(getattr(models.Product, field) for field in schemas.ProductRow.__annotations__)
+PRODUCT_LISTING_COLUMNS = PRODUCT_ROW_COLUMNS + (models.Product.version,)
+
+def product_row(row):
+    """A selected product row as a schemas.ProductRow dict. Trailing extra columns (version) are dropped."""
+    return dict(zip(schemas.ProductRow.__annotations__, row))
+
+def next_cursor(rows, limit: int):
+    """A full page means there may be more rows; the last id is the next page's cursor."""
+    if rows and len(rows) == min(limit, config.MAX_PAGE_SIZE):
+        return rows[-1].id
+    return None
+
+def _product_listing_query(filters: Optional[schemas.ProductFilters], limit: int, cursor: Optional[int]):
+    query = _filter_products(select(*PRODUCT_LISTING_COLUMNS), filters)
+    if cursor is not None:
+        query = query.filter(models.Product.id > cursor)
+    return query.order_by(models.Product.id).limit(min(limit, config.MAX_PAGE_SIZE))
+
+def get_all_products(db: Session, filters: Optional[schemas.ProductFilters] = None,
+                     limit: int = config.DEFAULT_PAGE_SIZE, cursor: Optional[int] = None):
+    """One keyset page of product rows ordered by id. `cursor` is the last id of the previous page."""
+    return db.execute(_product_listing_query(filters, limit, cursor)).all()
+
+def iter_products(db: Session, filters: Optional[schemas.ProductFilters] = None):
+    """Yield every matching product row in id order, fetching STREAM_BATCH_SIZE rows at a time."""
+    query = _filter_products(select(*PRODUCT_ROW_COLUMNS), filters).order_by(models.Product.id)
+    return db.execute(query.execution_options(yield_per=config.STREAM_BATCH_SIZE))
+
+def _product_prices_query(product_ids: List[int]):
+    columns = (models.Product.id, models.Product.price, models.Product.quantity, models.Product.status)
+    return select(*columns).where(models.Product.id.in_(product_ids)).order_by(models.Product.id)
+
+def get_product_prices(db: Session, product_ids: List[int]):
+    """Price, stock and status of the products in `product_ids` that exist, in id order."""
+    return [row._asdict() for row in db.execute(_product_prices_query(product_ids))]
 
 def get_product(db: Session, product_id: int):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -20,62 +124,546 @@ def get_product(db: Session, product_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found.")
     return product
 
+# Cached reads return serialized ProductResponse dicts rather than ORM objects,
+# so they can be shared across sessions and stored in an external cache.
+def _serialize_product(product: models.Product):
+    return schemas.ProductResponse.model_validate(product, from_attributes=True).model_dump(mode="json")
+
+def _listing_cache_key(filters: Optional[schemas.ProductFilters], limit: int, cursor: Optional[int]):
+    filter_part = filters.model_dump_json(exclude_none=True) if filters else "{}"
+    return f"{filter_part}:{limit}:{cursor}"
+
+# Weak ETags derived from row versions. They are computed when an entry is
+# cached, so a conditional GET that hits the cache is answered without
+# touching the database or serializing anything.
+def product_etag(product: models.Product):
+    return f'W/"{product.id}-{product.version}"'
+
+def listing_etag(rows):
+    digest = hashlib.sha1(",".join(f"{row.id}:{row.version}" for row in rows).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+def _cached_product_entry(product: models.Product):
+    return {"etag": product_etag(product), "product": _serialize_product(product)}
+
+# Listing pages are cached as the finished JSON body, so a cache hit serializes nothing
+def _cached_listing_entry(rows, limit: int):
+    return {
+        "etag": listing_etag(rows),
+        "body": schemas.product_rows_json.dump_json([product_row(row) for row in rows]),
+        "next_cursor": next_cursor(rows, limit),
+    }
+
+# refresh=True reloads from `db` and replaces the cached entry. Reads pinned to
+# the primary pass it, since an entry may have been filled from a lagging replica.
+def get_product_cached(db: Session, product_id: int, refresh: bool = False):
+    """{"etag", "product"} for one product, read through the product cache."""
+    return product_cache.get_product(product_id, lambda: _cached_product_entry(get_product(db, product_id)), refresh)
+
+def get_all_products_cached(db: Session, filters: Optional[schemas.ProductFilters] = None,
+                            limit: int = config.DEFAULT_PAGE_SIZE, cursor: Optional[int] = None,
+                            refresh: bool = False):
+    """{"etag", "body", "next_cursor"} for one listing page, read through the product cache."""
+    return product_cache.get_listing(
+        _listing_cache_key(filters, limit, cursor),
+        lambda: _cached_listing_entry(get_all_products(db, filters, limit, cursor), limit),
+        refresh,
+    )
+
+def _apply_product_update(product: models.Product, product_data: schemas.ProductCreate):
+    """Overwrite the product's fields. Restocking a sold-out product puts it back on sale,
+    since _reserve_stock never takes stock from a "Sold" product."""
+    sold_out = product.status == "Sold" and product.quantity == 0
+    for key, value in product_data.model_dump().items():
+        setattr(product, key, value)
+    if sold_out and product.quantity > 0:
+        product.status = "available"
+
+def _restocked_status(quantity):
+    """SQL twin of _apply_product_update's status rule, for the set-based bulk update."""
+    sold_out = and_(models.Product.status == "Sold", models.Product.quantity == 0)
+    return case((and_(sold_out, quantity > 0), "available"), else_=models.Product.status)
+
 def update_product(db: Session, product_id: int, product_data: schemas.ProductCreate):
     product = get_product(db, product_id)
-    for key, value in product_data.dict().items():
-        setattr(product, key, value)
+    _apply_product_update(product, product_data)
+    db.flush()
+    record_event(db, "product.updated", product_id, _product_payload(product))
     db.commit()
+    product_cache.invalidate_product(product_id)
     db.refresh(product)
     return product
 
 def mark_product_sold(db: Session, product_id: int):
     product = get_product(db, product_id)
     product.status = "Sold"
+    db.flush()
+    record_event(db, "product.updated", product_id, _product_payload(product))
     db.commit()
+    product_cache.invalidate_product(product_id)
     db.refresh(product)
     return product
 
 def delete_product(db: Session, product_id: int):
     product = get_product(db, product_id)
     db.delete(product)
+    record_event(db, "product.deleted", product_id, {"id": product_id})
     db.commit()
+    product_cache.invalidate_product(product_id)
     return
 
+# ---------------------------- Product Search ---------------------------- #
+
+# SQLite fallback: FTS5 table maintained by triggers (see models.py)
+products_fts = table("products_fts", column("rowid"), column("rank"), column("products_fts"))
+
+def _fts5_query(q: str):
+    # Quote every term so user input can't hit FTS5 query syntax; terms are ANDed
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+def _search_base(db: Session, q: str):
+    """select(Product.id, rank) for products matching `q`, plus the ORDER BY for best match first."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        query = func.websearch_to_tsquery("english", q)
+        document = models.search_document(models.Product.name, models.Product.description)
+        rank = func.ts_rank(document, query)
+        return select(models.Product.id, rank.label("rank")).where(document.op("@@")(query)), rank.desc()
+    if dialect == "sqlite":
+        rank = products_fts.c.rank  # bm25: lower is better
+        base = (select(models.Product.id, rank.label("rank"))
+                .join(products_fts, products_fts.c.rowid == models.Product.id)
+                .where(products_fts.c.products_fts.match(_fts5_query(q))))
+        return base, rank.asc()
+    # Unindexed fallback for other databases
+    pattern = f"%{q}%"
+    base = select(models.Product.id, literal(0.0).label("rank")).where(
+        models.Product.name.ilike(pattern) | models.Product.description.ilike(pattern))
+    return base, models.Product.id.asc()
+
+def _price_bucket():
+    bounds = config.SEARCH_PRICE_BUCKETS
+    return case(*((models.Product.price < bound, i) for i, bound in enumerate(bounds)), else_=len(bounds))
+
+def search_products(db: Session, q: str, filters: Optional[schemas.ProductFilters] = None,
+                    limit: int = config.DEFAULT_PAGE_SIZE, offset: int = 0):
+    """Ranked full-text search with status and price facets over the whole match set."""
+    base, best_first = _search_base(db, q)
+    base = _filter_products(base, filters)
+    matches = base.subquery()
+
+    total = db.scalar(select(func.count()).select_from(matches))
+    ranked_ids = db.scalars(base.order_by(best_first, models.Product.id).limit(min(limit, config.MAX_PAGE_SIZE)).offset(offset)).all()
+    products = {p.id: p for p in db.query(models.Product).filter(models.Product.id.in_(ranked_ids))} if ranked_ids else {}
+
+    faceted = select(models.Product.status, _price_bucket().label("bucket")).where(models.Product.id.in_(select(matches.c.id))).subquery()
+    status_counts = db.execute(select(faceted.c.status, func.count()).group_by(faceted.c.status)).all()
+    bucket_counts = dict(db.execute(select(faceted.c.bucket, func.count()).group_by(faceted.c.bucket)).all())
+    bounds = [None] + config.SEARCH_PRICE_BUCKETS + [None]
+
+    return schemas.ProductSearchResponse(
+        total=total,
+        limit=limit,
+        offset=offset,
+        items=[_serialize_product(products[product_id]) for product_id in ranked_ids if product_id in products],
+        facets=schemas.SearchFacets(
+            status={status_name or "unknown": count for status_name, count in status_counts},
+            price=[schemas.PriceFacet(min=bounds[i], max=bounds[i + 1], count=bucket_counts.get(i, 0))
+                   for i in range(len(bounds) - 1)],
+        ),
+    )
+
 # ---------------------------- Order CRUD ---------------------------- #
 
-def create_order(db: Session, order: schemas.OrderCreate):
-    product = get_product(db, order.product_id)
+def _reserve_stock(product_id: int, quantity: int):
+    """Conditional UPDATE that takes `quantity` units only if they are all still in stock.
+
+    The check and the decrement are one statement, so concurrent orders cannot
+    both see the same stock. The product flips to "Sold" when its last unit goes.
+    Returns the unit price and the new stock via RETURNING, or no row when the reservation failed.
+    """
+    return (
+        update(models.Product)
+        .where(
+            models.Product.id == product_id,
+            models.Product.quantity >= quantity,
+            models.Product.status.is_distinct_from("Sold"),
+        )
+        .values(
+            quantity=models.Product.quantity - quantity,
+            status=case((models.Product.quantity == quantity, "Sold"), else_=models.Product.status),
+            version=models.Product.version + 1,
+            updated_at=func.now(),
+        )
+        .returning(models.Product.price, models.Product.quantity, models.Product.status, models.Product.version)
+        .execution_options(synchronize_session=False)
+    )
+
+def _stock_conflict(product: Optional[models.Product]):
+    """Why _reserve_stock matched no row: the product is gone, sold, or short on stock."""
+    if product is None:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found.")
     if product.status == "Sold":
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product is already sold.")
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Product is already sold.")
+    return HTTPException(status_code=status.HTTP_409_CONFLICT,
+                         detail=f"Insufficient stock: {product.quantity} left.")
 
-    new_order = models.Order(**order.dict())
-    product.status = "Sold"
+def create_order(db: Session, order: schemas.OrderCreate):
+    reserved = db.execute(_reserve_stock(order.product_id, order.quantity)).first()
+    if reserved is None:
+        db.rollback()
+        raise _stock_conflict(db.get(models.Product, order.product_id))
+
+    new_order = models.Order(**order.model_dump(), total_price=round(reserved.price * order.quantity, 2))
     db.add(new_order)
+    record_sales(db, [(order.product_id, order.quantity, new_order.total_price)])
+    db.flush()
+    record_event(db, "product.stock_changed", order.product_id, _stock_payload(order.product_id, reserved))
+    record_event(db, "order.created", new_order.id, _order_payload(new_order))
     db.commit()
+    product_cache.invalidate_product(order.product_id)
     db.refresh(new_order)
     return new_order
 
-def get_all_orders(db: Session):
-    return db.query(models.Order).all()
+def _filter_orders(query, filters: Optional[schemas.OrderFilters]):
+    if filters is None:
+        return query
+    if filters.product_id is not None:
+        query = query.filter(models.Order.product_id == filters.product_id)
+    if filters.customer_id is not None:
+        query = query.filter(models.Order.customer_id == filters.customer_id)
+    if filters.created_after is not None:
+        query = query.filter(models.Order.created_at >= filters.created_after)
+    if filters.created_before is not None:
+        query = query.filter(models.Order.created_at < filters.created_before)
+    return query
+
+# Relations an order response can embed with ?expand=. The product is joined
+# into the orders query; payments for the whole page come from one
+# SELECT ... WHERE order_id IN (...). A page costs the same number of
+# queries whatever its size.
+ORDER_EXPANSIONS = {"product", "payments"}
+
+def _order_loaders(expand):
+    loaders = []
+    if "product" in expand:
+        loaders.append(joinedload(models.Order.product))
+    if "payments" in expand:
+        loaders.append(selectinload(models.Order.payments))
+    return loaders
+
+def get_all_orders(db: Session, filters: Optional[schemas.OrderFilters] = None,
+                   limit: int = config.DEFAULT_PAGE_SIZE, cursor: Optional[int] = None, expand=()):
+    """One keyset page of orders ordered by id. `cursor` is the last id of the previous page."""
+    query = _filter_orders(db.query(models.Order), filters).options(*_order_loaders(expand))
+    if cursor is not None:
+        query = query.filter(models.Order.id > cursor)
+    return query.order_by(models.Order.id).limit(min(limit, config.MAX_PAGE_SIZE)).all()
+
+def _customer_orders_query(customer_id: int, limit: int, cursor: Optional[int], expand):
+    query = select(models.Order).where(models.Order.customer_id == customer_id).options(*_order_loaders(expand))
+    if cursor is not None:
+        query = query.where(models.Order.id < cursor)
+    return query.order_by(models.Order.id.desc()).limit(min(limit, config.MAX_PAGE_SIZE))
+
+def get_customer_orders(db: Session, customer_id: int, limit: int = config.DEFAULT_PAGE_SIZE,
+                        cursor: Optional[int] = None, expand=()):
+    """One page of a customer's orders, newest first. `cursor` is the last id of the previous page."""
+    return db.scalars(_customer_orders_query(customer_id, limit, cursor, expand)).unique().all()
 
-def get_order(db: Session, order_id: int):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+def iter_orders(db: Session, filters: Optional[schemas.OrderFilters] = None):
+    """Yield every matching order in id order, fetching STREAM_BATCH_SIZE rows at a time."""
+    query = _filter_orders(db.query(models.Order), filters)
+    return query.order_by(models.Order.id).yield_per(config.STREAM_BATCH_SIZE)
+
+def get_order(db: Session, order_id: int, expand=()):
+    order = db.query(models.Order).options(*_order_loaders(expand)).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found.")
     return order
 
+# ---------------------------- Bulk Writes ---------------------------- #
+# Payloads are validated as a whole by the route before anything is written,
+# then written one transaction per BULK_CHUNK_SIZE items. A chunk that fails
+# is rolled back and its items reported as "error"; earlier chunks stay committed.
+
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def _chunks(items: list):
+    for start in range(0, len(items), config.BULK_CHUNK_SIZE):
+        yield start, items[start:start + config.BULK_CHUNK_SIZE]
+
+def _bulk_response(results: List[schemas.BulkItemResult]):
+    results.sort(key=lambda result: result.index)
+    failed = sum(result.status not in ("created", "updated") for result in results)
+    return schemas.BulkResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+def _chunk_failed(db: Session, start: int, chunk: list, exc: Exception):
+    db.rollback()
+    logger.error(f"Bulk write of items {start}-{start + len(chunk) - 1} failed: {exc}")
+    return [schemas.BulkItemResult(index=start + i, status="error", detail="Database error; chunk rolled back.")
+            for i in range(len(chunk))]
+
+def _insert_products(db: Session, products: list):
+    """Multi-row INSERT ... RETURNING the listing columns, rows in payload order."""
+    stmt = insert(models.Product).returning(*PRODUCT_LISTING_COLUMNS, sort_by_parameter_order=True)
+    return db.execute(stmt, [product.model_dump(exclude={"id"}) for product in products]).all()
+
+def _update_products(db: Session, products: list):
+    """Overwrite existing products in one statement via INSERT ... ON CONFLICT (id) DO UPDATE."""
+    rows = [product.model_dump() for product in products]
+    columns = list(schemas.ProductBase.model_fields)
+    bumped = {"version": models.Product.version + 1, "updated_at": func.now()}
+    dialect_insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is None:
+        # No ON CONFLICT support: executemany UPDATE by primary key instead
+        products_table = models.Product.__table__
+        stmt = (update(products_table)
+                .where(products_table.c.id == bindparam("product_id"))
+                .values({**{column: bindparam(f"new_{column}") for column in columns},
+                         "status": _restocked_status(bindparam("new_quantity")), **bumped}))
+        db.execute(stmt, [{"product_id": row["id"], **{f"new_{column}": row[column] for column in columns}} for row in rows])
+        return
+    stmt = dialect_insert(models.Product)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Product.id],
+        set_={**{column: stmt.excluded[column] for column in columns},
+              "status": _restocked_status(stmt.excluded.quantity), **bumped},
+    )
+    db.execute(stmt, rows)
+
+def bulk_create_products(db: Session, products: List[schemas.ProductCreate]):
+    results = []
+    for start, chunk in _chunks(products):
+        try:
+            rows = _insert_products(db, chunk)
+            record_events(db, "product.created", [_product_row_payload(row) for row in rows])
+            db.commit()
+        except SQLAlchemyError as exc:
+            results.extend(_chunk_failed(db, start, chunk, exc))
+            continue
+        results.extend(schemas.BulkItemResult(index=start + i, id=row.id, status="created")
+                       for i, row in enumerate(rows))
+    product_cache.invalidate_listings()
+    return _bulk_response(results)
+
+def bulk_upsert_products(db: Session, products: List[schemas.ProductUpsert]):
+    duplicates = sorted(product_id for product_id, count in Counter(
+        product.id for product in products if product.id is not None).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"Product ids appear more than once: {duplicates}.")
+    results = []
+    for start, chunk in _chunks(products):
+        wanted = {product.id for product in chunk if product.id is not None}
+        try:
+            existing = set(db.scalars(select(models.Product.id).where(models.Product.id.in_(wanted)))) if wanted else set()
+            updates = [(i, p) for i, p in enumerate(chunk) if p.id in existing]
+            creates = [(i, p) for i, p in enumerate(chunk) if p.id is None]
+            payloads = {}
+            if updates:
+                _update_products(db, [p for _, p in updates])
+                updated = db.execute(select(*PRODUCT_LISTING_COLUMNS).where(models.Product.id.in_(existing)))
+                payloads["product.updated"] = [_product_row_payload(row) for row in updated]
+            created_rows = _insert_products(db, [p for _, p in creates]) if creates else []
+            payloads["product.created"] = [_product_row_payload(row) for row in created_rows]
+            for event_type, event_payloads in payloads.items():
+                if event_payloads:
+                    record_events(db, event_type, event_payloads)
+            db.commit()
+        except SQLAlchemyError as exc:
+            results.extend(_chunk_failed(db, start, chunk, exc))
+            continue
+        results.extend(schemas.BulkItemResult(index=start + i, id=p.id, status="updated") for i, p in updates)
+        results.extend(schemas.BulkItemResult(index=start + i, id=row.id, status="created")
+                       for (i, _), row in zip(creates, created_rows))
+        results.extend(schemas.BulkItemResult(index=start + i, id=p.id, status="not_found", detail="Product not found.")
+                       for i, p in enumerate(chunk) if p.id is not None and p.id not in existing)
+        for _, product in updates:
+            product_cache.invalidate_product(product.id)
+    product_cache.invalidate_listings()
+    return _bulk_response(results)
+
+def bulk_create_orders(db: Session, orders: List[schemas.OrderCreate]):
+    """Place every order line on its own: each line reserves its stock or is reported as failed."""
+    results = []
+    touched = set()
+    for start, chunk in _chunks(orders):
+        placed, failed = [], []
+        try:
+            stock = {}  # product_id -> stock after this chunk's last reservation
+            for i, order in enumerate(chunk):
+                reserved = db.execute(_reserve_stock(order.product_id, order.quantity)).first()
+                if reserved is None:
+                    # The identity map may hold the product from before this chunk's reservations
+                    product = db.get(models.Product, order.product_id, populate_existing=True)
+                    failed.append((i, order, _stock_conflict(product)))
+                else:
+                    placed.append((i, order, round(reserved.price * order.quantity, 2)))
+                    stock[order.product_id] = _stock_payload(order.product_id, reserved)
+            stmt = insert(models.Order).returning(*models.Order.__table__.c, sort_by_parameter_order=True)
+            order_rows = db.execute(stmt, [{**order.model_dump(), "total_price": total}
+                                           for _, order, total in placed]).all() if placed else []
+            if placed:
+                record_sales(db, [(order.product_id, order.quantity, total) for _, order, total in placed])
+                record_events(db, "product.stock_changed", list(stock.values()))
+                record_events(db, "order.created", [_order_payload(row) for row in order_rows])
+            db.commit()
+        except SQLAlchemyError as exc:
+            results.extend(_chunk_failed(db, start, chunk, exc))
+            continue
+        touched.update(order.product_id for _, order, _ in placed)
+        results.extend(schemas.BulkItemResult(index=start + i, id=row.id, status="created")
+                       for (i, _, _), row in zip(placed, order_rows))
+        results.extend(schemas.BulkItemResult(
+            index=start + i, status="not_found" if error.status_code == status.HTTP_404_NOT_FOUND else "conflict",
+            detail=error.detail) for i, _, error in failed)
+    for product_id in touched:
+        product_cache.invalidate_product(product_id)
+    return _bulk_response(results)
+
 # ---------------------------- Payment CRUD ---------------------------- #
+# Payments are recorded as pending and verified by the background worker in
+# payments.py, so a slow provider never holds a request worker.
 
-def verify_payment(db: Session, payment_data: schemas.PaymentRequest):
-    order = get_order(db, payment_data.order_id)
-    # Mock payment verification logic
-    if payment_data.amount <= 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payment amount.")
-
-    # Assume success for demo
-    response = {
-        "order_id": payment_data.order_id,
-        "amount": payment_data.amount,
-        "status": "Payment Verified"
-    }
-    return response
+def _replayed_payment(existing: models.Payment, payment_data: schemas.PaymentRequest):
+    """A retry with the same Idempotency-Key gets the original payment back, if it is the same request."""
+    if existing.order_id != payment_data.order_id or existing.amount_paid != payment_data.amount \
+            or existing.payment_method != payment_data.payment_method:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Idempotency-Key was already used for a different payment request.")
+    return existing
+
+def get_payment_by_key(db: Session, idempotency_key: str):
+    return db.query(models.Payment).filter(models.Payment.idempotency_key == idempotency_key).first()
+
+def create_payment(db: Session, payment_data: schemas.PaymentRequest, idempotency_key: Optional[str] = None):
+    """Record a pending payment. Returns (payment, created); created is False for an idempotent replay."""
+    if idempotency_key:
+        existing = get_payment_by_key(db, idempotency_key)
+        if existing:
+            return _replayed_payment(existing, payment_data), False
+    get_order(db, payment_data.order_id)
+
+    payment = models.Payment(
+        order_id=payment_data.order_id,
+        amount_paid=payment_data.amount,
+        payment_method=payment_data.payment_method,
+        status=models.PaymentStatusEnum.pending,
+        idempotency_key=idempotency_key,
+    )
+    db.add(payment)
+    try:
+        db.flush()
+        record_event(db, "payment.created", payment.id, _payment_payload(payment))
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same key won the insert
+        db.rollback()
+        existing = get_payment_by_key(db, idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise
+        return _replayed_payment(existing, payment_data), False
+    db.refresh(payment)
+    return payment, True
+
+def get_payment(db: Session, payment_id: int):
+    payment = db.get(models.Payment, payment_id)
+    if not payment:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Payment not found.")
+    return payment
+
+# ---------------------------- Analytics Rollups ---------------------------- #
+# Writers add to the daily rollups inside their own transaction, so a report
+# never counts an order that was rolled back or misses one that committed.
+# The upserts need ON CONFLICT, i.e. Postgres or SQLite.
+
+ROLLUP_SUMS = {
+    models.DailyProductSales: ("orders", "units", "revenue"),
+    models.DailyPaymentStats: ("completed", "failed", "amount_completed"),
+}
+
+def _rollup_increment(dialect: str, model, day):
+    """INSERT ... ON CONFLICT DO UPDATE that adds each parameter set's counters to the day's row."""
+    table = model.__table__
+    stmt = UPSERT_INSERTS[dialect](table).values(day=day)
+    return stmt.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={column: table.c[column] + stmt.excluded[column] for column in ROLLUP_SUMS[model]},
+    )
+
+def sales_rollup(dialect: str, lines):
+    """(statement, params) adding placed order lines [(product_id, units, revenue)] to today's sales."""
+    per_product = {}
+    for product_id, units, revenue in lines:
+        orders, total_units, total_revenue = per_product.get(product_id, (0, 0, 0.0))
+        per_product[product_id] = (orders + 1, total_units + units, total_revenue + revenue)
+    # Sorted, so concurrent multi-product transactions lock rollup rows in the same order
+    params = [{"product_id": product_id, "orders": orders, "units": units, "revenue": round(revenue, 2)}
+              for product_id, (orders, units, revenue) in sorted(per_product.items())]
+    return _rollup_increment(dialect, models.DailyProductSales, func.current_date()), params
+
+def record_sales(db: Session, lines):
+    db.execute(*sales_rollup(db.get_bind().dialect.name, lines))
+
+def payment_rollup(dialect: str, day, succeeded: bool, amount: float):
+    """(statement, params) counting one settled payment on the day it was created."""
+    params = {"completed": int(succeeded), "failed": int(not succeeded), "amount_completed": amount if succeeded else 0.0}
+    return _rollup_increment(dialect, models.DailyPaymentStats, day), params
+
+def get_sales_by_day(db: Session, start: date, end: date, product_id: Optional[int] = None):
+    sales = models.DailyProductSales
+    query = (select(sales.day, func.sum(sales.orders), func.sum(sales.units), func.sum(sales.revenue))
+             .where(sales.day >= start, sales.day <= end)
+             .group_by(sales.day).order_by(sales.day))
+    if product_id is not None:
+        query = query.where(sales.product_id == product_id)
+    return [schemas.SalesDay(day=day, orders=orders, units=units, revenue=round(revenue, 2))
+            for day, orders, units, revenue in db.execute(query)]
+
+def get_top_products(db: Session, start: date, end: date, limit: int = config.DEFAULT_PAGE_SIZE):
+    sales = models.DailyProductSales
+    revenue = func.sum(sales.revenue)
+    query = (select(sales.product_id, func.sum(sales.orders), func.sum(sales.units), revenue)
+             .where(sales.day >= start, sales.day <= end)
+             .group_by(sales.product_id).order_by(revenue.desc(), sales.product_id)
+             .limit(min(limit, config.MAX_PAGE_SIZE)))
+    return [schemas.ProductSales(product_id=product_id, orders=orders, units=units, revenue=round(total, 2))
+            for product_id, orders, units, total in db.execute(query)]
+
+def get_payment_stats(db: Session, start: date, end: date):
+    stats = models.DailyPaymentStats
+    query = select(stats).where(stats.day >= start, stats.day <= end).order_by(stats.day)
+    return [schemas.PaymentDay(
+        day=row.day, completed=row.completed, failed=row.failed, amount_completed=round(row.amount_completed, 2),
+        success_rate=round(row.completed / (row.completed + row.failed), 4) if row.completed + row.failed else None,
+    ) for row in db.scalars(query)]
+
+def rebuild_rollups(db: Session):
+    """Recompute both rollups from orders and payments, e.g. to backfill existing history.
+
+    Run it while writes are stopped: an order committed during the rebuild
+    could be counted twice or not at all.
+    """
+    sales, payment_stats = models.DailyProductSales, models.DailyPaymentStats
+    Order, Payment = models.Order, models.Payment
+    db.execute(delete(sales))
+    db.execute(delete(payment_stats))
+
+    order_day = func.date(Order.created_at)
+    db.execute(insert(sales).from_select(
+        ["day", "product_id", "orders", "units", "revenue"],
+        select(order_day, Order.product_id, func.count(), func.sum(Order.quantity), func.sum(Order.total_price))
+        .group_by(order_day, Order.product_id),
+    ))
+
+    payment_day = func.date(Payment.created_at)
+    completed = Payment.status == models.PaymentStatusEnum.completed
+    db.execute(insert(payment_stats).from_select(
+        ["day", "completed", "failed", "amount_completed"],
+        select(payment_day, func.sum(case((completed, 1), else_=0)), func.sum(case((completed, 0), else_=1)),
+               func.sum(case((completed, Payment.amount_paid), else_=0.0)))
+        .where(Payment.status.in_([models.PaymentStatusEnum.completed, models.PaymentStatusEnum.failed]))
+        .group_by(payment_day),
+    ))
+    db.commit()
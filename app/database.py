@@ -1,24 +1,50 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
-import os  # module for handling environment configurations
-from dotenv import load_dotenv
+from sqlalchemy.pool import QueuePool
 
+from . import config, pool_metrics
+from .replicas import ReplicaRouter
 
-# Load variables from .env
-load_dotenv()
-
-#Fetch DATBASE_URL from environment variables
-DATABASE_URL = os.getenv("DATABASE_URL")
+# config.py loads .env
+DATABASE_URL = config.DATABASE_URL
 
 #Validate DATABASE_URL
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set in your .env file")
-    
-# Safely fetch the value from .env
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create the DB Connection
-engine = create_engine(DATABASE_URL)
+def engine_options(url, name: str, pool_class=QueuePool):
+    """Pool and timeout settings from config for an engine on `url`, reporting as `name`."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        # SQLite connections are local files; keep SQLAlchemy's default pool
+        return {}
+    options = {
+        "poolclass": pool_metrics.timed_pool_class(name, pool_class),
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    if config.DB_STATEMENT_TIMEOUT_MS and url.get_backend_name() == "postgresql":
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+# Create the DB Connection. Nothing connects until the first checkout; the app
+# lifespan (warmup.py) opens and primes the pool, and disposes it on shutdown.
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, "primary"))
+pool_metrics.instrument("primary", engine)
+
+# Read replicas, if configured; read-only routes get their sessions through read_router
+replica_engines = []
+for index, replica_url in enumerate(config.DATABASE_REPLICA_URLS):
+    replica_engines.append(create_engine(replica_url, **engine_options(replica_url, f"replica-{index}")))
+    pool_metrics.instrument(f"replica-{index}", replica_engines[-1])
+read_router = ReplicaRouter(engine, replica_engines)
 
 
 # Allow us to interact with the DB (opening a session)
@@ -1,66 +1,163 @@
-import sys
+import asyncio
 import os
 import logging
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import HTTPException as FastAPIHTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 
-# ---------------------------- Fix for Module Import Error ---------------------------- #
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
 # ---------------------------- Local Imports ---------------------------- #
-from app import models
-from app.database import engine
-from app import routes  # Make sure these exist
+# The schema is managed by Alembic migrations (alembic upgrade head), run as a
+# separate step before the app starts; importing the app never touches the database.
+from app import config, metrics, outbox, payments, ratelimit, warmup
+from app.replicas import ReadYourWritesMiddleware
+from app import routes
 
 # ---------------------------- Logging Configuration ---------------------------- #
-logging.basicConfig(level=logging.ERROR)
+logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-# ---------------------------- FastAPI App Initialization ---------------------------- #
-app = FastAPI(
-    title="E-commerce API",
-    version="1.0.0"
-)
-
-# ---------------------------- Database Table Creation ---------------------------- #
-models.Base.metadata.create_all(bind=engine)
-
-# ---------------------------- Routers ---------------------------- #
-app.include_router(routes.router, prefix="/api")
-
-# ---------------------------- Custom Exception Handlers ---------------------------- #
-@app.exception_handler(FastAPIHTTPException)
-async def custom_http_exception_handler(request: Request, exc: FastAPIHTTPException):
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={
-            "success": False,
-            "error": {
-                "code": exc.status_code,
-                "message": exc.detail
-            }
-        }
+# ---------------------------- Background Workers ---------------------------- #
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs in the background: the worker is live at once and reports
+    # ready when the pool is primed (see warmup.warm_up)
+    async def start_when_warm():
+        await warmup.warm_up(app.state.readiness)
+        outbox.relay.start()  # polls the outbox tables, so waits for the migrated schema
+
+    warm_up = asyncio.create_task(start_when_warm())
+    payments.worker.start()
+    yield
+    warm_up.cancel()
+    outbox.relay.stop()
+    payments.worker.stop()
+    await warmup.dispose_engines()
+
+# ---------------------------- FastAPI App Factory ---------------------------- #
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="E-commerce API",
+        version="1.0.0",
+        lifespan=lifespan,
     )
+    app.state.readiness = warmup.Readiness()
+
+    # ---------------------------- Compression ---------------------------- #
+    if config.COMPRESSION == "br":
+        try:
+            from brotli_asgi import BrotliMiddleware  # optional dependency
+            app.add_middleware(BrotliMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE, quality=config.COMPRESSION_LEVEL)
+        except ImportError:
+            logger.error("COMPRESSION=br but brotli-asgi is not installed; using gzip")
+            app.add_middleware(GZipMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE,
+                               compresslevel=min(config.COMPRESSION_LEVEL, 9))
+    elif config.COMPRESSION == "gzip":
+        app.add_middleware(GZipMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE,
+                           compresslevel=min(config.COMPRESSION_LEVEL, 9))
+
+    # ---------------------------- Rate Limiting & Load Shedding ---------------------------- #
+    # Shedding sits inside the rate limiter, so throttled clients never count as in flight
+    app.add_middleware(ratelimit.LoadShedMiddleware)
+    if config.RATE_LIMIT_ENABLED:
+        app.add_middleware(ratelimit.RateLimitMiddleware)
+
+    # ---------------------------- Metrics ---------------------------- #
+    if config.METRICS_ENABLED:
+        metrics.install_query_hooks()
+        app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False, dependencies=[Depends(metrics.require_token)])
+        def metrics_endpoint():
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    # ---------------------------- Read Replicas ---------------------------- #
+    # The catalog snapshot lags writes like a replica does, so writers are pinned for it too
+    if config.DATABASE_REPLICA_URLS or config.CATALOG_SNAPSHOT_PATH:
+        app.add_middleware(ReadYourWritesMiddleware)
+
+    # ---------------------------- Routers ---------------------------- #
+    if config.DB_MODE == "async":
+        from app import async_routes  # only async workers pay for importing the async stack
+        # Sync-only routes go first so their static paths win over the async {id} paths
+        app.include_router(async_routes.sync_fallback_router(routes.router), prefix="/api")
+        app.include_router(async_routes.router, prefix="/api")
+    else:
+        app.include_router(routes.router, prefix="/api")
 
-@app.exception_handler(Exception)
-async def global_exception_handler(request: Request, exc: Exception):
-    error_id = os.urandom(4).hex()  # Unique error ID for easier debugging
-    logger.error(f"Unhandled server error ({error_id}): {exc}")
-    return JSONResponse(
-        status_code=HTTP_500_INTERNAL_SERVER_ERROR,
-        content={
-            "success": False,
-            "error": {
-                "code": HTTP_500_INTERNAL_SERVER_ERROR,
-                "message": "An unexpected error occurred. Please try again later.",
-                "error_id": error_id
+    # ---------------------------- Health Checks ---------------------------- #
+    @app.get("/health/live", tags=["Monitoring"])
+    async def liveness():
+        """The process is up and serving requests. Never touches the database."""
+        return {"status": "alive"}
+
+    @app.get("/health/ready", tags=["Monitoring"])
+    async def readiness(request: Request):
+        """Warm-up has finished and the primary database answers; 503 otherwise."""
+        state = request.app.state.readiness
+        if not state.ready:
+            return JSONResponse(status_code=503, content={"status": "starting", "detail": state.error})
+        try:
+            await asyncio.wait_for(warmup.ping(), timeout=config.HEALTH_CHECK_TIMEOUT_SECONDS)
+        except (SQLAlchemyError, asyncio.TimeoutError) as exc:
+            return JSONResponse(status_code=503, content={"status": "unavailable", "detail": str(exc) or "timeout"})
+        return {"status": "ready", "warmup_seconds": state.warmup_seconds}
+
+    # ---------------------------- Custom Exception Handlers ---------------------------- #
+    @app.exception_handler(FastAPIHTTPException)
+    async def custom_http_exception_handler(request: Request, exc: FastAPIHTTPException):
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={
+                "success": False,
+                "error": {
+                    "code": exc.status_code,
+                    "message": exc.detail
+                }
             }
-        }
-    )
+        )
+
+    @app.exception_handler(StaleDataError)
+    async def stale_data_exception_handler(request: Request, exc: StaleDataError):
+        # The row's version changed between our read and write (e.g. an order took stock)
+        return JSONResponse(
+            status_code=409,
+            content={
+                "success": False,
+                "error": {
+                    "code": 409,
+                    "message": "The resource was modified concurrently. Please retry."
+                }
+            }
+        )
+
+    @app.exception_handler(Exception)
+    async def global_exception_handler(request: Request, exc: Exception):
+        error_id = os.urandom(4).hex()  # Unique error ID for easier debugging
+        logger.error(f"Unhandled server error ({error_id}): {exc}")
+        return JSONResponse(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            content={
+                "success": False,
+                "error": {
+                    "code": HTTP_500_INTERNAL_SERVER_ERROR,
+                    "message": "An unexpected error occurred. Please try again later.",
+                    "error_id": error_id
+                }
+            }
+        )
+
+    # ---------------------------- Root Route (Optional) ---------------------------- #
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to the E-commerce API!"}
+
+    return app
+
 
-# ---------------------------- Root Route (Optional) ---------------------------- #
-@app.get("/")
-async def root():
-    return {"message": "Welcome to the E-commerce API!"}
+# uvicorn app.main:app, or uvicorn --factory app.main:create_app
+app = create_app()
@@ -0,0 +1,240 @@
+import hmac
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Seconds; tuned for API latencies from sub-millisecond cache hits to slow exports
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# ---------------------------- Metric Types ---------------------------- #
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text}{"," if label_text else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text}{"," if label_text else ""}le="+Inf"}} {values[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {values[-2]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{{{_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+
+
+def _family(name: str, metric_type: str, help_text: str, samples):
+    """Render a metric family from (labels dict, value) pairs collected at scrape time."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{{{_labels(labels.keys(), labels.values())}}} {value}")
+    return lines
+
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency by route.", ("method", "route", "status"))
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements executed per sampled request.", ("route",), QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram("http_request_db_duration_seconds", "Time spent in SQL per sampled request.", ("route",))
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "Latency of individual SQL statements.")
+N_PLUS_ONE = Counter("http_request_n_plus_one_total", "Sampled requests over METRICS_N_PLUS_ONE_THRESHOLD queries.", ("route",))
+RATE_LIMITED = Counter("http_requests_rate_limited_total", "Requests rejected with 429 by the rate limiter.", ("route",))
+LOAD_SHED = Counter("http_requests_shed_total", "Requests rejected with 503 by load shedding.", ("reason",))
+
+
+# ---------------------------- Per-request SQL Profiling ---------------------------- #
+
+class RequestProfile:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Set only for sampled requests. The object is mutated in place, so statements
+# run from the threadpool (sync routes) still report into the request's profile.
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    QUERY_LATENCY.observe(elapsed)
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.queries += 1
+        profile.db_time += elapsed
+
+
+def install_query_hooks():
+    """Time every SQL statement on every engine (sync, async and replicas alike)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------------------------- Access ---------------------------- #
+
+def is_trusted(scope, token: str) -> bool:
+    """The request carries `token` as "Authorization: Bearer <token>"."""
+    if not token:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            return hmac.compare_digest(value, f"Bearer {token}".encode())
+    return False
+
+
+def require_token(request: Request):
+    """Dependency for /metrics and the monitoring routes: 401 without METRICS_TOKEN, when one is set."""
+    if config.METRICS_TOKEN and not is_trusted(request.scope, config.METRICS_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid metrics token.")
+
+
+# ---------------------------- ASGI Middleware ---------------------------- #
+
+class MetricsMiddleware:
+    """Records latency for every request; sampled requests also get SQL counts.
+
+    Sampled requests get a Server-Timing header only with `server_timing`.
+    Requests bearing `token` are always sampled and always get one, so an
+    operator can profile a single request in production.
+
+    A plain ASGI middleware rather than @app.middleware("http"), which would
+    buffer streaming responses and add a task hop to every request.
+    """
+
+    def __init__(self, app, sample_rate: float = config.METRICS_SAMPLE_RATE,
+                 n_plus_one_threshold: int = config.METRICS_N_PLUS_ONE_THRESHOLD,
+                 server_timing: bool = config.METRICS_SERVER_TIMING, token: str = config.METRICS_TOKEN):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.server_timing = server_timing
+        self.token = token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        trusted = is_trusted(scope, self.token)
+        profile = RequestProfile() if trusted or random.random() < self.sample_rate else None
+        server_timing = profile is not None and (self.server_timing or trusted)
+        token = _current_profile.set(profile)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if server_timing:
+                    total_ms = (time.perf_counter() - started) * 1000
+                    timing = (f'app;dur={total_ms:.1f}, db;dur={profile.db_time * 1000:.1f};'
+                              f'desc="{profile.queries} queries"')
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - started, scope["method"], route_path, status_code)
+            if profile is not None:
+                REQUEST_QUERIES.observe(profile.queries, route_path)
+                REQUEST_DB_TIME.observe(profile.db_time, route_path)
+                if profile.queries > self.n_plus_one_threshold:
+                    N_PLUS_ONE.inc(route_path)
+                    logger.warning(f"{scope['method']} {route_path} ran {profile.queries} queries; likely N+1")
+
+
+# ---------------------------- Exposition ---------------------------- #
+
+def render():
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    from . import cache, pool_metrics  # imported here to keep this module free of app wiring
+
+    lines = []
+    for metric in (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, QUERY_LATENCY, N_PLUS_ONE, RATE_LIMITED, LOAD_SHED):
+        lines.extend(metric.render())
+
+    pools = pool_metrics.snapshot()
+    for field, help_text in (
+        ("checkedout", "Connections currently checked out."),
+        ("overflow", "Connections open beyond pool_size."),
+        ("timeouts", "Checkouts that gave up waiting for a connection."),
+        ("wait_avg_ms", "Average time to obtain a connection, in milliseconds."),
+        ("wait_p95_recent_ms", "95th percentile wait over recent checkouts, in milliseconds."),
+    ):
+        samples = [({"pool": name}, stats[field]) for name, stats in pools.items() if field in stats]
+        lines.extend(_family(f"db_pool_{field}", "gauge", help_text, samples))
+
+    cache_stats = cache.product_cache.stats()
+    lines.extend(_family("product_cache_hits_total", "counter", "Product cache hits.", [({}, cache_stats["hits"])]))
+    lines.extend(_family("product_cache_misses_total", "counter", "Product cache misses.", [({}, cache_stats["misses"])]))
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, DateTime, Column, Float, Integer, String, Enum
+from sqlalchemy import DDL, JSON, BigInteger, ForeignKey, Date, DateTime, Column, Float, Integer, String, Enum, Index, event, literal_column
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -11,41 +11,163 @@ class PaymentStatusEnum(str, enum.Enum):
     failed = "failed"
 
 
+def search_document(name, description):
+    """tsvector of a product's name + description for Postgres full-text search.
+
+    The GIN index on products is built from this expression; queries must use
+    the same function or the planner will not pick the index.
+    """
+    return func.to_tsvector(
+        literal_column("'english'::regconfig"),
+        func.coalesce(name, literal_column("''")) + literal_column("' '")
+        + func.coalesce(description, literal_column("''")),
+    )
+
+
 class Product(Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(String)
-    price = Column(Float, nullable=False)
+    price = Column(Float, nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     status = Column(String, default="available")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Bumped on every write; ETags are derived from it. The ORM increments it
+    # itself (version_id_col); Core UPDATEs in crud.py must do it explicitly.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     orders = relationship("Order", back_populates="product", cascade="all, delete")
 
+    # eager_defaults: server-generated columns come back via RETURNING on flush,
+    # so outbox events can carry the full row before the transaction commits
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
+
+    # Keyset pages filtered by status walk this index in id order
+    __table_args__ = (
+        Index("ix_products_status_id", "status", "id"),
+        Index("ix_products_search", search_document(name, description), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+
+# ---------------------------- Product Search ---------------------------- #
+# SQLite (local runs and tests): an external-content FTS5 table kept in sync by triggers.
+# Quantity/status updates from order placement don't touch the index.
+for statement in (
+    "CREATE VIRTUAL TABLE products_fts USING fts5(name, description, content='products', content_rowid='id')",
+    """CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+):
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Product.__table__, "before_drop", DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"))
+
 
 class Order(Base):
     __tablename__ = "orders"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    # No foreign key: customers live in the identity provider
+    customer_id = Column(Integer)
     quantity = Column(Integer, nullable=False)
     total_price = Column(Float, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     product = relationship("Product", back_populates="orders")
     payments = relationship("Payment", back_populates="order", cascade="all, delete")
 
+    __mapper_args__ = {"eager_defaults": True}
+
+    # A customer's order history, newest first, walks this index backwards
+    __table_args__ = (Index("ix_orders_customer_id_id", "customer_id", "id"),)
+
 
 class Payment(Base):
     __tablename__ = "payments"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     payment_method = Column(String, nullable=False)
     amount_paid = Column(Float, nullable=False)
     status = Column(Enum(PaymentStatusEnum), default=PaymentStatusEnum.pending)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Client-supplied Idempotency-Key; the unique constraint makes retried POSTs land on one row
+    idempotency_key = Column(String(255), unique=True)
+    failure_reason = Column(String)
+    # Set by the worker that claimed the payment; another worker may only claim it once this has passed
+    lease_until = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     order = relationship("Order", back_populates="payments")
+
+    __mapper_args__ = {"eager_defaults": True}
+
+
+# ---------------------------- Analytics Rollups ---------------------------- #
+# Incremented in the same transaction as the write they count (see
+# crud.record_sales and payments.PaymentWorker), so reports read O(days) rows
+# instead of scanning orders. crud.rebuild_rollups recomputes them from scratch.
+
+class DailyProductSales(Base):
+    __tablename__ = "daily_product_sales"
+
+    day = Column(Date, primary_key=True)
+    # No foreign key: sales history outlives deleted products
+    product_id = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+class DailyPaymentStats(Base):
+    __tablename__ = "daily_payment_stats"
+
+    # Day the payment was created, so a late settlement still lands on its own day
+    day = Column(Date, primary_key=True)
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    amount_completed = Column(Float, nullable=False, default=0)
+
+
+# ---------------------------- Outbox ---------------------------- #
+# Change events written by crud in the same transaction as the change itself.
+# The relay (outbox.py) stamps committed events with `sequence`, a gap-free
+# stream position; consumers of GET /api/events page by it, never by id,
+# because ids can commit out of order.
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    sequence = Column(BigInteger, unique=True)  # NULL until relayed
+    topic = Column(String(32), nullable=False)  # "product", "order" or "payment"
+    type = Column(String(64), nullable=False)  # e.g. "product.updated"
+    entity_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    published_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # The relay's work queue: small, since published rows drop out of it
+        Index("ix_outbox_unpublished", "id", postgresql_where=sequence.is_(None), sqlite_where=sequence.is_(None)),
+        Index("ix_outbox_events_published_at", "published_at"),
+    )
+
+
+class OutboxCursor(Base):
+    """Single row holding the last sequence handed out; the relay locks it so relays in
+    several processes number events one batch after another."""
+    __tablename__ = "outbox_cursor"
+
+    id = Column(Integer, primary_key=True)
+    last_sequence = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from . import config, models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------- Publishing ---------------------------- #
+
+class EventPublisher:
+    """Hands relayed events to an external broker (Kafka, SNS, a webhook fan-out...).
+
+    The default publishes nowhere: relayed events are served by GET /api/events.
+    A batch may be published again if the relay dies before committing it, so
+    consumers should de-duplicate on the event's sequence.
+    """
+
+    def publish(self, events):
+        pass
+
+
+class EventNotifier:
+    """Wakes GET /api/events long-polls in this process as soon as the relay commits a batch."""
+
+    def __init__(self):
+        self.latest = 0  # last sequence relayed by this process
+        self._waiters = set()  # (loop, future)
+        self._lock = threading.Lock()
+
+    def notify(self, sequence: int):
+        """Called from the relay thread."""
+        with self._lock:
+            self.latest = max(self.latest, sequence)
+            waiters = list(self._waiters)
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:  # the waiter's loop has closed
+                pass
+
+    async def wait(self, seen: int, timeout: float):
+        """Sleep up to `timeout` seconds, returning early once something newer than `seen` is relayed."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            if self.latest != seen:
+                return
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait({waiter[1]}, timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# ---------------------------- Relay ---------------------------- #
+
+class OutboxRelay:
+    """Background thread that numbers committed outbox events and publishes them in batches.
+
+    Each batch runs under a lock on the outbox_cursor row, so relays in
+    several processes hand out sequences one batch after another. Events are
+    picked up in id order once their transaction has committed; an event whose
+    transaction commits late simply lands in a later batch with a later sequence.
+    """
+
+    # Seconds between prunes of events older than the retention window
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, publisher: EventPublisher, session_factory=SessionLocal, notifier: EventNotifier = None,
+                 batch_size: int = config.OUTBOX_BATCH_SIZE, interval: float = config.OUTBOX_RELAY_INTERVAL,
+                 retention_hours: float = config.OUTBOX_RETENTION_HOURS):
+        self.publisher = publisher
+        self.session_factory = session_factory
+        self.notifier = notifier
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retention_hours = retention_hours
+        self._stop = threading.Event()
+        self._thread = None
+        self._pruned_at = float("-inf")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                relayed = self.relay_once()
+                if time.monotonic() - self._pruned_at >= self.PRUNE_INTERVAL:
+                    self.prune()
+            except Exception:
+                logger.exception("Outbox relay batch failed; retrying")
+                relayed = 0
+            if relayed < self.batch_size:
+                self._stop.wait(self.interval)
+
+    def relay_once(self) -> int:
+        """Publish and number one batch of unrelayed events. Returns how many were relayed."""
+        with self.session_factory() as db:
+            cursor = db.scalar(select(models.OutboxCursor).where(models.OutboxCursor.id == 1).with_for_update())
+            if cursor is None:
+                cursor = models.OutboxCursor(id=1, last_sequence=0)
+                db.add(cursor)
+            events = db.scalars(
+                select(models.OutboxEvent)
+                .where(models.OutboxEvent.sequence.is_(None))
+                .order_by(models.OutboxEvent.id)
+                .limit(self.batch_size)
+            ).all()
+            if not events:
+                db.rollback()
+                return 0
+
+            self.publisher.publish(events)
+            published_at = datetime.now(timezone.utc)
+            for event in events:
+                cursor.last_sequence += 1
+                event.sequence = cursor.last_sequence
+                event.published_at = published_at
+            last_sequence = cursor.last_sequence
+            db.commit()
+
+        if self.notifier is not None:
+            self.notifier.notify(last_sequence)
+        return len(events)
+
+    def prune(self):
+        self._pruned_at = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.retention_hours)
+        with self.session_factory() as db:
+            db.execute(delete(models.OutboxEvent).where(models.OutboxEvent.published_at < cutoff))
+            db.commit()
+
+
+notifier = EventNotifier()
+relay = OutboxRelay(EventPublisher(), notifier=notifier)
+
+
+def configure(publisher: EventPublisher):
+    """Swap the publisher, e.g. for one that forwards events to a message broker."""
+    relay.publisher = publisher
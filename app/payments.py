@@ -0,0 +1,161 @@
+import importlib
+import logging
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import or_, update
+
+from . import config, crud, models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------- Providers ---------------------------- #
+
+@dataclass
+class ProviderResult:
+    success: bool
+    reason: Optional[str] = None
+
+
+class PaymentProvider:
+    """Talks to the payment provider. Called from worker threads, never from a request."""
+
+    def verify(self, payment: models.Payment, order_total: float) -> ProviderResult:
+        raise NotImplementedError
+
+
+class FakePaymentProvider(PaymentProvider):
+    """Local stand-in: sleeps for `latency_ms`, then approves unless the amount is short or a random failure hits."""
+
+    def __init__(self, latency_ms: float = config.PAYMENT_PROVIDER_LATENCY_MS,
+                 failure_rate: float = config.PAYMENT_PROVIDER_FAILURE_RATE):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+
+    def verify(self, payment: models.Payment, order_total: float) -> ProviderResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if payment.amount_paid < order_total:
+            return ProviderResult(False, f"Amount {payment.amount_paid} does not cover order total {order_total}.")
+        if random.random() < self.failure_rate:
+            return ProviderResult(False, "Declined by provider.")
+        return ProviderResult(True)
+
+
+def load_provider(spec: str = config.PAYMENT_PROVIDER) -> PaymentProvider:
+    """Construct the provider named by `spec` ("module:Class")."""
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+# ---------------------------- Worker ---------------------------- #
+
+class PaymentWorker:
+    """Thread pool that moves pending payments to completed/failed.
+
+    Before calling the provider a worker claims the payment by setting its
+    lease with a conditional UPDATE, committed on its own; a payment enqueued
+    in several processes (e.g. by recover_pending on every worker at startup)
+    is claimed, and sent to the provider, by one of them. The provider call
+    runs outside any transaction, and the result is written with a
+    conditional UPDATE on status = pending, so it is only settled once even
+    if a lease expired mid-call and another process retried it.
+    """
+
+    def __init__(self, provider: PaymentProvider, session_factory=SessionLocal, workers: int = config.PAYMENT_WORKERS,
+                 lease_seconds: float = config.PAYMENT_LEASE_SECONDS):
+        self.provider = provider
+        self.session_factory = session_factory
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.queue = queue.Queue()
+        self._threads = []
+
+    def enqueue(self, payment_id: int):
+        self.queue.put(payment_id)
+
+    @staticmethod
+    def _claimable(now: datetime):
+        return (models.Payment.status == models.PaymentStatusEnum.pending,
+                or_(models.Payment.lease_until.is_(None), models.Payment.lease_until < now))
+
+    def recover_pending(self):
+        """Requeue pending payments no live worker holds: never claimed, or their lease expired."""
+        with self.session_factory() as db:
+            pending = db.query(models.Payment.id).filter(*self._claimable(datetime.now(timezone.utc)))
+            for (payment_id,) in pending:
+                self.enqueue(payment_id)
+
+    def claim(self, db, payment_id: int) -> bool:
+        """Lease the payment to this worker. False if it is settled or another worker holds it."""
+        now = datetime.now(timezone.utc)
+        claimed = db.execute(
+            update(models.Payment)
+            .where(models.Payment.id == payment_id, *self._claimable(now))
+            .values(lease_until=now + timedelta(seconds=self.lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return bool(claimed.rowcount)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"payment-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while True:
+            payment_id = self.queue.get()
+            try:
+                if payment_id is None:
+                    return
+                self.process(payment_id)
+            except Exception:
+                logger.exception(f"Payment {payment_id} could not be processed")
+            finally:
+                self.queue.task_done()
+
+    def process(self, payment_id: int):
+        with self.session_factory() as db:
+            if not self.claim(db, payment_id):
+                return
+            payment = db.get(models.Payment, payment_id)
+            order_total = payment.order.total_price
+            db.expunge(payment)
+            db.rollback()  # don't hold a transaction open across the provider call
+
+            result = self.provider.verify(payment, order_total)
+            settled = db.execute(
+                update(models.Payment)
+                .where(models.Payment.id == payment_id, models.Payment.status == models.PaymentStatusEnum.pending)
+                .values(
+                    status=models.PaymentStatusEnum.completed if result.success else models.PaymentStatusEnum.failed,
+                    failure_reason=result.reason,
+                    lease_until=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if settled.rowcount:
+                dialect = db.get_bind().dialect.name
+                db.execute(*crud.payment_rollup(dialect, payment.created_at.date(), result.success, payment.amount_paid))
+                crud.record_event(db, "payment.completed" if result.success else "payment.failed", payment_id,
+                                  {"id": payment_id, "order_id": payment.order_id, "failure_reason": result.reason})
+            db.commit()
+
+
+worker = PaymentWorker(load_provider())
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# How many recent checkout waits to keep for the percentile figures
+RECENT_WAITS = 1024
+
+
+class PoolStats:
+    """Counters for one connection pool, fed by the pool class and pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=RECENT_WAITS)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.recent_waits.append((time.monotonic(), seconds))
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def recent_wait(self, pct: float, within: Optional[float] = None) -> float:
+        """Percentile of recent checkout waits; `within` only counts checkouts from the last that many seconds."""
+        since = time.monotonic() - within if within is not None else float("-inf")
+        with self._lock:
+            waits = sorted(seconds for at, seconds in self.recent_waits if at >= since)
+        if not waits:
+            return 0.0
+        return waits[min(len(waits) - 1, int(pct / 100 * len(waits)))]
+
+    def as_dict(self):
+        with self._lock:
+            checkouts, wait_total = self.checkouts, self.wait_total
+            counters = {
+                "checkouts": checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_avg_ms": round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+            }
+        counters["wait_p95_recent_ms"] = round(self.recent_wait(95) * 1000, 3)
+        return counters
+
+
+class _TimedPoolMixin:
+    """Times `Pool.connect()`, i.e. how long a caller blocks before it holds a connection.
+
+    That includes queueing for a free connection, opening a new one when the
+    pool may still grow into its overflow, and the pre-ping. The pool events
+    only fire once a connection is held, so they cannot see the wait.
+    """
+
+    stats: PoolStats
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - started)
+
+
+# name -> PoolStats / engine, so the monitoring endpoint can list every pool
+_stats = {}
+_engines = {}
+
+
+def timed_pool_class(name: str, base):
+    """Subclass of pool class `base` that reports into the stats registered under `name`.
+
+    The stats live on the class, so they survive `pool.recreate()` (engine.dispose()).
+    """
+    stats = _stats.setdefault(name, PoolStats())
+    return type(f"Timed{base.__name__}", (_TimedPoolMixin, base), {"stats": stats})
+
+
+def instrument(name: str, engine):
+    """Track connects, checkins and invalidations for `engine` and register it for reporting."""
+    stats = _stats.setdefault(name, PoolStats())
+    _engines[name] = engine
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.increment("connects")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.increment("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.increment("invalidations")
+
+
+def get_stats(name: str) -> PoolStats:
+    return _stats.setdefault(name, PoolStats())
+
+
+def snapshot():
+    """Current occupancy plus cumulative counters for every registered pool."""
+    report = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        entry = {"pool": type(pool).__name__}
+        # Only QueuePool-style pools know their size and overflow
+        for attr in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, attr):
+                entry[attr if attr != "size" else "pool_size"] = getattr(pool, attr)()
+        entry.update(get_stats(name).as_dict())
+        report[name] = entry
+    return report
@@ -0,0 +1,214 @@
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from starlette.responses import JSONResponse
+
+from . import config, metrics, pool_metrics
+
+
+def route_key(scope) -> str:
+    """"METHOD /path" as used by the route cost and exemption settings."""
+    return f"{scope['method']} {scope['path'].rstrip('/') or '/'}"
+
+
+def _networks(proxies: Iterable[str]):
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def _is_trusted(address: str, networks) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(scope, trusted_proxies=()) -> str:
+    """The peer address, or behind trusted proxies the rightmost X-Forwarded-For hop they did not add."""
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if not trusted_proxies or not _is_trusted(address, trusted_proxies):
+        return address
+    forwarded = [value.decode("latin-1") for name, value in scope.get("headers", ()) if name == b"x-forwarded-for"]
+    hops = [hop.strip() for hop in ",".join(forwarded).split(",") if hop.strip()]
+    # Proxies append, so hops left of the first untrusted one (from the right) are client-supplied
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted_proxies):
+            return hop
+    return hops[0] if hops else address
+
+
+def client_key(scope, api_keys=frozenset(), trusted_proxies=()) -> str:
+    """Clients are identified by their API key when it is one of `api_keys`, otherwise by IP."""
+    for name, value in scope.get("headers", ()):
+        if name == b"x-api-key" and value.decode("latin-1") in api_keys:
+            return f"key:{value.decode('latin-1')}"
+    return f"ip:{client_ip(scope, trusted_proxies)}"
+
+
+async def _reject(scope, receive, send, status_code: int, message: str, retry_after: float):
+    # Same body shape as the HTTPException handler in main.py
+    response = JSONResponse(
+        status_code=status_code,
+        content={"success": False, "error": {"code": status_code, "message": message}},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+    await response(scope, receive, send)
+
+
+# ---------------------------- Token Buckets ---------------------------- #
+
+class RateLimitBackend:
+    """Token bucket storage used by RateLimiter. A shared backend (e.g. Redis with a Lua
+    script doing the same arithmetic) lets every worker enforce one limit per client."""
+
+    def take(self, key: str, cost: float, rate: float, burst: float):
+        """Spend `cost` tokens from `key`'s bucket. Returns (allowed, seconds until `cost` is available)."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryTokenBuckets(RateLimitBackend):
+    """Per-process buckets; the least recently seen clients are dropped past `max_clients`."""
+
+    def __init__(self, max_clients: int = config.RATE_LIMIT_MAX_CLIENTS, clock=time.monotonic):
+        self.max_clients = max_clients
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, rate: float, burst: float):
+        cost = min(cost, burst)  # otherwise a request costing more than the burst could never pass
+        with self._lock:
+            now = self._clock()
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    """Charges each request its route's cost against the client's token bucket.
+
+    Buckets live in the backend; with the default in-memory one every worker
+    process has its own, so a client gets up to `rate` per worker.
+    """
+
+    def __init__(self, backend: RateLimitBackend, rate: float = config.RATE_LIMIT_PER_SECOND,
+                 burst: float = config.RATE_LIMIT_BURST, route_costs=config.RATE_LIMIT_ROUTE_COSTS,
+                 api_keys=config.RATE_LIMIT_API_KEYS, trusted_proxies=config.TRUSTED_PROXIES):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.route_costs = route_costs
+        self.api_keys = frozenset(api_keys)
+        self.trusted_proxies = _networks(trusted_proxies)
+
+    def check(self, scope) -> Optional[float]:
+        """None if the request may proceed, otherwise seconds the client should wait."""
+        route = route_key(scope)
+        key = client_key(scope, self.api_keys, self.trusted_proxies)
+        allowed, retry_after = self.backend.take(key, self.route_costs.get(route, 1), self.rate, self.burst)
+        if allowed:
+            return None
+        # Raw paths carry ids; only the configured routes are worth a label of their own
+        metrics.RATE_LIMITED.inc(route if route in self.route_costs else "other")
+        return retry_after
+
+
+rate_limiter = RateLimiter(InMemoryTokenBuckets())
+
+
+def configure(backend: RateLimitBackend):
+    """Swap the token bucket backend, e.g. for one shared between workers."""
+    rate_limiter.backend = backend
+
+
+# ---------------------------- ASGI Middleware ---------------------------- #
+
+class RateLimitMiddleware:
+    """Answers 429 with Retry-After once a client has spent its tokens."""
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        retry_after = self.limiter.check(scope)
+        if retry_after is not None:
+            return await _reject(scope, receive, send, 429, "Rate limit exceeded. Please slow down.", retry_after)
+        await self.app(scope, receive, send)
+
+
+class LoadShedMiddleware:
+    """Answers 503 with Retry-After while the process is overloaded, so queued work can drain.
+
+    Overloaded means too many requests in flight, or DB pool checkouts
+    recently waiting too long. Routes in `exempt` (checkout) are never shed;
+    routes in `ignore` (event long-polls) are neither shed nor counted.
+    """
+
+    # The pool wait percentile is recomputed at most this often
+    POOL_CHECK_INTERVAL = 0.1
+
+    def __init__(self, app, max_in_flight: int = config.LOAD_SHED_MAX_IN_FLIGHT,
+                 max_pool_wait_ms: float = config.LOAD_SHED_MAX_POOL_WAIT_MS,
+                 window: float = config.LOAD_SHED_WINDOW_SECONDS, exempt=config.LOAD_SHED_EXEMPT,
+                 ignore=config.LOAD_SHED_IGNORE,
+                 pool: str = "async" if config.DB_MODE == "async" else "primary"):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_pool_wait_ms = max_pool_wait_ms
+        self.window = window
+        self.exempt = exempt
+        self.ignore = ignore
+        self.pool = pool
+        self.in_flight = 0  # only touched on the event loop
+        self._pool_wait_ms = 0.0
+        self._pool_checked_at = float("-inf")
+
+    def _pool_wait(self) -> float:
+        now = time.monotonic()
+        if now - self._pool_checked_at >= self.POOL_CHECK_INTERVAL:
+            self._pool_checked_at = now
+            self._pool_wait_ms = pool_metrics.get_stats(self.pool).recent_wait(95, within=self.window) * 1000
+        return self._pool_wait_ms
+
+    def overload_reason(self) -> Optional[str]:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.max_pool_wait_ms and self._pool_wait() > self.max_pool_wait_ms:
+            return "pool_wait"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or route_key(scope) in self.ignore:
+            return await self.app(scope, receive, send)
+        if route_key(scope) not in self.exempt:
+            reason = self.overload_reason()
+            if reason is not None:
+                metrics.LOAD_SHED.inc(reason)
+                return await _reject(scope, receive, send, 503, "Server is busy. Please retry shortly.", 1)
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
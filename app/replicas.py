@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from http.cookies import SimpleCookie
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Set after a successful write; reads carrying it go to the primary until it expires
+PRIMARY_COOKIE = "primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+# ---------------------------- Replica Selection ---------------------------- #
+
+class ReplicaRouter:
+    """Picks the engine for a read: replicas in round-robin order, the primary as last resort.
+
+    A replica that fails to connect, or drops a connection mid-query, is
+    skipped for `retry_after` seconds and then tried again.
+    """
+
+    def __init__(self, primary, replicas=(), retry_after: float = config.REPLICA_RETRY_SECONDS, clock=time.monotonic):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.retry_after = retry_after
+        self._clock = clock
+        self._next = 0
+        self._down_until = {}  # replica index -> clock time it may be tried again
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            self._watch(replica)
+
+    def _watch(self, replica):
+        @event.listens_for(getattr(replica, "sync_engine", replica), "handle_error")
+        def _on_error(context):
+            if context.is_disconnect:
+                self.mark_down(replica)
+
+    def candidates(self):
+        """Engines to try for one read, in order: healthy replicas starting at the next in turn, then the primary."""
+        with self._lock:
+            start = self._next
+            if self.replicas:
+                self._next = (self._next + 1) % len(self.replicas)
+            now = self._clock()
+            healthy = [
+                self.replicas[(start + offset) % len(self.replicas)]
+                for offset in range(len(self.replicas))
+                if self._down_until.get((start + offset) % len(self.replicas), 0) <= now
+            ]
+        return healthy + [self.primary]
+
+    def mark_down(self, replica):
+        index = self.replicas.index(replica)
+        with self._lock:
+            self._down_until[index] = self._clock() + self.retry_after
+        logger.warning(f"Read replica {index} is unavailable; skipping it for {self.retry_after}s")
+
+    def stats(self):
+        now = self._clock()
+        with self._lock:
+            down = {index for index, until in self._down_until.items() if until > now}
+        return {
+            "replicas": len(self.replicas),
+            "healthy": len(self.replicas) - len(down),
+            "down": sorted(down),
+        }
+
+
+def open_read_session(router: ReplicaRouter, session_factory, pin_to_primary: bool = False):
+    """A session bound to the first reachable read engine.
+
+    Replica sessions connect up front, so an unreachable replica is caught
+    here and the read moves on to the next one instead of failing the request.
+    """
+    engines = [router.primary] if pin_to_primary else router.candidates()
+    for engine in engines:
+        db = session_factory(bind=engine)
+        if engine is router.primary:
+            return db
+        try:
+            db.connection()
+            return db
+        except DBAPIError:
+            db.close()
+            router.mark_down(engine)
+
+async def open_async_read_session(router: ReplicaRouter, session_factory, pin_to_primary: bool = False):
+    """open_read_session for AsyncSession factories."""
+    engines = [router.primary] if pin_to_primary else router.candidates()
+    for engine in engines:
+        db = session_factory(bind=engine)
+        if engine is router.primary:
+            return db
+        try:
+            await db.connection()
+            return db
+        except DBAPIError:
+            await db.close()
+            router.mark_down(engine)
+
+
+# ---------------------------- Read-your-writes ---------------------------- #
+
+def pinned_to_primary(cookies) -> bool:
+    """Whether the client wrote recently enough that replicas may not have its write yet."""
+    try:
+        return float(cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for `window` seconds after each successful write.
+
+    The deadline travels in a cookie, so it holds across workers and hosts
+    without shared state. Installed when replicas or the catalog snapshot are
+    configured; pinned reads skip both.
+    """
+
+    def __init__(self, app, window: float = config.READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[PRIMARY_COOKIE] = f"{time.time() + self.window:.3f}"
+                cookie[PRIMARY_COOKIE].update({"max-age": int(self.window) + 1, "path": "/", "httponly": True, "samesite": "Lax"})
+                header = cookie.output(header="").strip()
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", header.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime, timedelta, timezone
+import time
 
-from . import crud, schemas  # Use relative imports for your local modules
-from .database import SessionLocal
+from . import cache, config, crud, metrics, outbox, payments, pool_metrics, replicas, schemas, snapshot  # Use relative imports for your local modules
+from .database import SessionLocal, read_router
 
 router = APIRouter()
 
@@ -17,6 +21,71 @@ def get_db():
     finally:
         db.close()
 
+# Read-only routes use this instead: a replica when any are configured, or the
+# primary while the client is inside its read-your-writes window.
+def _open_read_session(request: Request):
+    return replicas.open_read_session(read_router, SessionLocal, replicas.pinned_to_primary(request.cookies))
+
+def get_read_db(request: Request):
+    db = _open_read_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ------------------------------------------------------
+# Listing helpers — keyset cursors and NDJSON exports
+# ------------------------------------------------------
+def _set_next_cursor(response: Response, cursor: Optional[int]):
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = str(cursor)
+
+def _orm_json(response_schema):
+    """Serializer for ORM objects: validate against `response_schema`, then dump."""
+    return lambda obj: response_schema.model_validate(obj, from_attributes=True).model_dump_json().encode()
+
+def _product_row_json(row):
+    return schemas.product_row_json.dump_json(crud.product_row(row))
+
+def _ndjson_stream(iter_rows, to_json, filters, open_session):
+    # The request-scoped session is closed before the body is streamed,
+    # so the export opens and owns its own session.
+    def generate():
+        db = open_session()
+        try:
+            for row in iter_rows(db, filters):
+                yield to_json(row) + b"\n"
+        finally:
+            db.close()
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def _json_body(body: bytes, response: Response):
+    """Return already-serialized JSON as is. FastAPI only copies headers set on the
+    injected `response` into responses it builds itself, so carry them over here."""
+    raw = Response(content=body, media_type="application/json")
+    raw.headers.update(response.headers)
+    return raw
+
+# ------------------------------------------------------
+# HTTP caching helpers — ETag / If-None-Match
+# ------------------------------------------------------
+def _etag_matches(request: Request, etag: str):
+    """Weak comparison against If-None-Match, as RFC 9110 requires for GET."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+def _conditional_response(request: Request, response: Response, etag: str):
+    """Add ETag/Cache-Control; return a bodiless 304 when the client already holds this version."""
+    headers = {"ETag": etag, "Cache-Control": config.CATALOG_CACHE_CONTROL}
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
 # ------------------------------------------------------
 # Base API Root Route
 # ------------------------------------------------------
@@ -28,18 +97,103 @@ def root():
 # ------------------------------------------------------
 # Product Routes
 # ------------------------------------------------------
+def _check_created_range(filters):
+    if (filters.created_after is not None and filters.created_before is not None
+            and filters.created_after > filters.created_before):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="created_after must not be later than created_before.")
+
+def product_filters(filters: schemas.ProductFilters = Depends()):
+    """The listing filters from the query string; 422 when a range can match nothing."""
+    if filters.min_price is not None and filters.max_price is not None and filters.min_price > filters.max_price:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="min_price must not exceed max_price.")
+    _check_created_range(filters)
+    return filters
+
 @router.get("/products", response_model=List[schemas.ProductResponse], tags=["Products"])
-def get_products(db: Session = Depends(get_db)):
-    """Retrieve all available products."""
-    return crud.get_all_products(db)
+def get_products(
+    request: Request,
+    response: Response,
+    filters: schemas.ProductFilters = Depends(product_filters),
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last product id of the previous page"),
+    stream: bool = Query(False, description="Stream every matching product as NDJSON"),
+):
+    """Retrieve a page of products. The next page's cursor is returned in the X-Next-Cursor header."""
+    if stream:
+        return _ndjson_stream(crud.iter_products, _product_row_json, filters, lambda: _open_read_session(request))
+    pinned = replicas.pinned_to_primary(request.cookies)
+    # Served from the shared catalog snapshot when there is one; a session is only opened without it
+    page = None if pinned else snapshot.catalog.listing(filters, limit, cursor)
+    if page is None:
+        with _open_read_session(request) as db:
+            page = crud.get_all_products_cached(db, filters, limit, cursor, pinned)
+    not_modified = _conditional_response(request, response, page["etag"])
+    if not_modified:
+        return not_modified
+    _set_next_cursor(response, page["next_cursor"])
+    return _json_body(page["body"], response)
+
+def product_ids(ids: str = Query(..., description="Comma-separated product ids")):
+    try:
+        parsed = [int(product_id) for product_id in ids.split(",") if product_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma-separated integers.")
+    if not parsed or len(parsed) > config.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Pass between 1 and {config.MAX_PAGE_SIZE} ids.")
+    return parsed
+
+def search_terms(q: str = Query(..., min_length=1, max_length=200, description="Words to look for in name and description")):
+    """`q` without surrounding whitespace; 422 when nothing is left to search for."""
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="q must not be blank.")
+    return q
+
+# Search, price and bulk routes are declared before /products/{product_id} so their paths are not parsed as an id
+@router.get("/products/search", response_model=schemas.ProductSearchResponse, tags=["Products"])
+def search_products(
+    q: str = Depends(search_terms),
+    filters: schemas.ProductFilters = Depends(product_filters),
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    """Search products by text, best match first, with status and price facet counts."""
+    return crud.search_products(db, q, filters, limit, offset)
+
+@router.get("/products/prices", response_model=List[schemas.ProductPrice], tags=["Products"])
+def get_product_prices(request: Request, ids: List[int] = Depends(product_ids)):
+    """Current price, stock and status of several products, e.g. to price a cart. Unknown ids are left out."""
+    pinned = replicas.pinned_to_primary(request.cookies)
+    prices = None if pinned else snapshot.catalog.prices(ids)
+    if prices is None:
+        with _open_read_session(request) as db:
+            prices = crud.get_product_prices(db, ids)
+    return prices
+
+@router.post("/products/bulk", response_model=schemas.BulkResponse, tags=["Products"])
+def bulk_create_products(
+    products: List[schemas.ProductCreate] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    db: Session = Depends(get_db),
+):
+    """Create many products at once, one transaction per chunk. Returns a result per item."""
+    return crud.bulk_create_products(db, products)
+
+@router.put("/products/bulk", response_model=schemas.BulkResponse, tags=["Products"])
+def bulk_upsert_products(
+    products: List[schemas.ProductUpsert] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    db: Session = Depends(get_db),
+):
+    """Update products that carry an id and create those that don't. Returns a result per item."""
+    return crud.bulk_upsert_products(db, products)
 
 @router.get("/products/{product_id}", response_model=schemas.ProductResponse, tags=["Products"])
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Retrieve a product by its ID."""
-    product = crud.get_product(db, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
-    return product
+def get_product(product_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    """Retrieve a product by its ID. Honours If-None-Match with a 304."""
+    entry = crud.get_product_cached(db, product_id, replicas.pinned_to_primary(request.cookies))
+    return _conditional_response(request, response, entry["etag"]) or entry["product"]
 
 @router.post("/products", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED, tags=["Products"])
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
@@ -65,10 +219,8 @@ def mark_product_sold(product_id: int, db: Session = Depends(get_db)):
 @router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Products"])
 def delete_product(product_id: int, db: Session = Depends(get_db)):
     """Delete a product."""
-    deleted = crud.delete_product(db, product_id)
-    if not deleted:
-        raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
-    return
+    crud.delete_product(db, product_id)  # raises 404 itself when the product is missing
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # ------------------------------------------------------
 # Order Routes
@@ -78,26 +230,232 @@ def create_order(order_data: schemas.OrderCreate, db: Session = Depends(get_db))
     """Create a new order."""
     return crud.create_order(db, order_data)
 
-@router.get("/orders", response_model=List[schemas.OrderResponse], tags=["Orders"])
-def get_orders(db: Session = Depends(get_db)):
-    """Retrieve all orders."""
-    return crud.get_all_orders(db)
+@router.post("/orders/bulk", response_model=schemas.BulkResponse, tags=["Orders"])
+def bulk_create_orders(
+    orders: List[schemas.OrderCreate] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    db: Session = Depends(get_db),
+):
+    """Place a multi-line order. Each line succeeds or fails on its own stock; results are per line."""
+    return crud.bulk_create_orders(db, orders)
+
+def order_expand(expand: Optional[str] = Query(None, description="Comma-separated relations to embed: product, payments")):
+    fields = {field.strip() for field in expand.split(",") if field.strip()} if expand else set()
+    unknown = fields - crud.ORDER_EXPANSIONS
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Cannot expand: {', '.join(sorted(unknown))}.")
+    return fields
 
-@router.get("/orders/{order_id}", response_model=schemas.OrderResponse, tags=["Orders"])
-def get_order(order_id: int, db: Session = Depends(get_db)):
+def order_filters(filters: schemas.OrderFilters = Depends()):
+    """product_filters for orders: 422 when the created range can match nothing."""
+    _check_created_range(filters)
+    return filters
+
+def _order_view(order, expand):
+    """OrderDetail with only the expanded relations set. Routes use response_model_exclude_unset,
+    so the others are left out of the response, and are never lazy-loaded."""
+    fields = {name: getattr(order, name) for name in schemas.OrderResponse.model_fields}
+    return schemas.OrderDetail.model_validate({**fields, **{name: getattr(order, name) for name in expand}},
+                                              from_attributes=True)
+
+@router.get("/orders", response_model=List[schemas.OrderDetail], response_model_exclude_unset=True, tags=["Orders"])
+def get_orders(
+    request: Request,
+    response: Response,
+    filters: schemas.OrderFilters = Depends(order_filters),
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last order id of the previous page"),
+    stream: bool = Query(False, description="Stream every matching order as NDJSON"),
+    expand: set = Depends(order_expand),
+    db: Session = Depends(get_read_db),
+):
+    """Retrieve a page of orders. The next page's cursor is returned in the X-Next-Cursor header."""
+    if stream:
+        if expand:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="expand is not supported with stream=true.")
+        return _ndjson_stream(crud.iter_orders, _orm_json(schemas.OrderResponse), filters, lambda: _open_read_session(request))
+    orders = crud.get_all_orders(db, filters, limit, cursor, expand)
+    _set_next_cursor(response, crud.next_cursor(orders, limit))
+    return [_order_view(order, expand) for order in orders]
+
+@router.get("/orders/{order_id}", response_model=schemas.OrderDetail, response_model_exclude_unset=True, tags=["Orders"])
+def get_order(order_id: int, expand: set = Depends(order_expand), db: Session = Depends(get_read_db)):
     """Retrieve an order by its ID."""
-    order = crud.get_order(db, order_id)
+    order = crud.get_order(db, order_id, expand)
     if not order:
         raise HTTPException(status_code=404, detail=f"Order with ID {order_id} not found.")
-    return order
+    return _order_view(order, expand)
+
+@router.get("/customers/{customer_id}/orders", response_model=List[schemas.OrderDetail],
+            response_model_exclude_unset=True, tags=["Orders"])
+def get_customer_orders(
+    customer_id: int,
+    response: Response,
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last order id of the previous page"),
+    expand: set = Depends(order_expand),
+    db: Session = Depends(get_read_db),
+):
+    """A customer's order history, newest first. The next page's cursor is returned in the X-Next-Cursor header."""
+    orders = crud.get_customer_orders(db, customer_id, limit, cursor, expand)
+    _set_next_cursor(response, crud.next_cursor(orders, limit))
+    return [_order_view(order, expand) for order in orders]
 
 # ------------------------------------------------------
 # Payment Routes
 # ------------------------------------------------------
 @router.post("/payments", response_model=schemas.PaymentResponse, status_code=status.HTTP_201_CREATED, tags=["Payments"])
-def process_payment(payment: schemas.PaymentRequest, db: Session = Depends(get_db)):
-    """Process a payment request."""
-    response = crud.verify_payment(db, payment)
-    if not response:
-        raise HTTPException(status_code=400, detail="Payment verification failed.")
-    return response
+def process_payment(
+    payment: schemas.PaymentRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255, description="Retries with the same key return the original payment"),
+    db: Session = Depends(get_db),
+):
+    """Record a payment as pending and queue it for verification. Poll GET /payments/{id} for the outcome."""
+    record, created = crud.create_payment(db, payment, idempotency_key)
+    if created:
+        payments.worker.enqueue(record.id)
+    else:
+        response.status_code = status.HTTP_200_OK
+    return record
+
+@router.get("/payments/{payment_id}", response_model=schemas.PaymentResponse, tags=["Payments"])
+def get_payment(payment_id: int, db: Session = Depends(get_read_db)):
+    """Retrieve a payment and its current status."""
+    return crud.get_payment(db, payment_id)
+
+# ------------------------------------------------------
+# Analytics Routes — served from the daily rollup tables
+# ------------------------------------------------------
+def _report_range(start: Optional[date], end: Optional[date]):
+    """Inclusive (start, end) in UTC days: the last ANALYTICS_DEFAULT_DAYS unless given."""
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=config.ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end.")
+    if (end - start).days >= config.ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"A report may span at most {config.ANALYTICS_MAX_DAYS} days.")
+    return start, end
+
+@router.get("/analytics/sales", response_model=List[schemas.SalesDay], tags=["Analytics"])
+def get_sales(
+    start: Optional[date] = Query(None, description="First day, inclusive (UTC)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (UTC); defaults to today"),
+    product_id: Optional[int] = Query(None, gt=0, description="Only this product's sales"),
+    db: Session = Depends(get_read_db),
+):
+    """Orders, units sold and revenue per day. Days without sales are omitted."""
+    return crud.get_sales_by_day(db, *_report_range(start, end), product_id)
+
+@router.get("/analytics/sales/products", response_model=List[schemas.ProductSales], tags=["Analytics"])
+def get_top_products(
+    start: Optional[date] = Query(None, description="First day, inclusive (UTC)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (UTC); defaults to today"),
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
+    """Products ranked by revenue over the range."""
+    return crud.get_top_products(db, *_report_range(start, end), limit)
+
+@router.get("/analytics/payments", response_model=List[schemas.PaymentDay], tags=["Analytics"])
+def get_payment_stats(
+    start: Optional[date] = Query(None, description="First day, inclusive (UTC)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (UTC); defaults to today"),
+    db: Session = Depends(get_read_db),
+):
+    """Settled payments and success rate per day the payments were made."""
+    return crud.get_payment_stats(db, *_report_range(start, end))
+
+# ------------------------------------------------------
+# Change Events — the relayed outbox, tailed by sequence
+# ------------------------------------------------------
+EVENT_TOPICS = {"product", "order", "payment"}
+
+def _event_topics(topics: Optional[str]):
+    topic_list = [topic.strip() for topic in topics.split(",") if topic.strip()] if topics else []
+    unknown = set(topic_list) - EVENT_TOPICS
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unknown topics: {', '.join(sorted(unknown))}.")
+    return topic_list
+
+def _load_events(request: Request, after: int, topics: List[str], limit: int):
+    db = _open_read_session(request)
+    try:
+        return [schemas.ChangeEvent.model_validate(event, from_attributes=True)
+                for event in crud.get_events(db, after, topics, limit)]
+    finally:
+        db.close()
+
+async def _next_events(request: Request, after: int, topics: List[str], limit: int, wait: float):
+    """Events past `after`, waiting up to `wait` seconds for the first one to be relayed.
+
+    The relay in this process wakes the wait as soon as it commits a batch;
+    the table is also re-checked every EVENTS_POLL_INTERVAL for events
+    relayed by other processes.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        seen = outbox.notifier.latest
+        events = await run_in_threadpool(_load_events, request, after, topics, limit)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0 or await request.is_disconnected():
+            return events
+        await outbox.notifier.wait(seen, min(remaining, config.EVENTS_POLL_INTERVAL))
+
+async def _sse_stream(request: Request, after: int, topics: List[str], limit: int):
+    while not await request.is_disconnected():
+        events = await _next_events(request, after, topics, limit, config.EVENTS_MAX_WAIT_SECONDS)
+        if not events:
+            yield b": keep-alive\n\n"  # keeps proxies from timing out an idle stream
+            continue
+        for event in events:
+            yield f"id: {event.sequence}\nevent: {event.type}\ndata: {event.model_dump_json()}\n\n".encode()
+        after = events[-1].sequence
+
+@router.get("/events", response_model=schemas.EventPage, tags=["Events"])
+async def get_events(
+    request: Request,
+    after: int = Query(0, ge=0, description="Last sequence already seen; 0 starts at the oldest retained event"),
+    topics: Optional[str] = Query(None, description="Comma-separated topics: product, order, payment"),
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    wait: float = Query(0, ge=0, le=config.EVENTS_MAX_WAIT_SECONDS,
+                        description="Seconds to hold the request open when nothing newer exists"),
+    last_event_id: Optional[int] = Header(None, ge=0, description="Sent by EventSource clients when they reconnect"),
+):
+    """Changes to products, orders and payments after the `after` cursor.
+
+    Long-polls with ?wait=; clients accepting text/event-stream get a
+    Server-Sent Events stream instead, resumed from Last-Event-ID.
+    """
+    topic_list = _event_topics(topics)
+    if "text/event-stream" in request.headers.get("accept", ""):
+        after = last_event_id if last_event_id is not None else after
+        return StreamingResponse(_sse_stream(request, after, topic_list, limit), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    events = await _next_events(request, after, topic_list, limit, wait)
+    return schemas.EventPage(events=events, next_cursor=events[-1].sequence if events else after)
+
+# ------------------------------------------------------
+# Monitoring Routes
+# ------------------------------------------------------
+@router.get("/pool-stats", tags=["Monitoring"], dependencies=[Depends(metrics.require_token)])
+def get_pool_stats():
+    """Connection pool occupancy, overflow and checkout wait times per engine."""
+    return pool_metrics.snapshot()
+
+@router.get("/replica-stats", tags=["Monitoring"], dependencies=[Depends(metrics.require_token)])
+def get_replica_stats():
+    """Configured read replicas and which of them are currently skipped as unhealthy."""
+    return read_router.stats()
+
+@router.get("/cache-stats", tags=["Monitoring"], dependencies=[Depends(metrics.require_token)])
+def get_cache_stats():
+    """Product cache hit/miss counters."""
+    return cache.product_cache.stats()
+
+@router.get("/snapshot-stats", tags=["Monitoring"], dependencies=[Depends(metrics.require_token)])
+def get_snapshot_stats():
+    """Generation, size and age of the catalog snapshot this worker serves from."""
+    return snapshot.catalog.stats()
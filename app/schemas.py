@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional, Literal
-from datetime import datetime
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, TypeAdapter, field_validator
+from typing import Dict, List, Optional, Literal
+from typing_extensions import TypedDict  # pydantic needs this TypedDict on Python < 3.12
+from datetime import date, datetime
 
 #-------------------------------Product Schemas--------------------------------
 class ProductBase(BaseModel):
@@ -14,30 +15,152 @@ class ProductCreate(ProductBase):
     pass
 
 
+class ProductUpsert(ProductBase):
+    # Omit id to create a new product; an unknown id is reported as not_found
+    id: Optional[int] = Field(None, gt=0, example=1)
+
+
+class ProductFilters(BaseModel):
+    status: Optional[str] = Field(None, example="available")
+    min_price: Optional[float] = Field(None, ge=0, example=10.0)
+    max_price: Optional[float] = Field(None, ge=0, example=50.0)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
 class ProductResponse(ProductBase):
+    # Stock reaches 0 once the last unit is ordered; only new products need at least 1
+    quantity: int = Field(..., ge=0, example=10)
+    id: int
+    status: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductRow(TypedDict):
+    """ProductResponse as a plain dict, for listings serialized straight from selected columns.
+
+    Keys must stay in ProductResponse field order so both paths emit identical JSON.
+    """
+    name: str
+    description: Optional[str]
+    price: float
+    quantity: int
     id: int
     status: str
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+
+# Compiled once; dump_json serializes without re-validating rows that came from the database
+product_row_json = TypeAdapter(ProductRow)
+product_rows_json = TypeAdapter(List[ProductRow])
+
+
+class ProductPrice(BaseModel):
+    """What a cart needs to price and check a line, without the rest of the product."""
+    id: int
+    price: float
+    quantity: int
+    status: str
+
+
+class PriceFacet(BaseModel):
+    min: Optional[float] = None  # inclusive; None means unbounded
+    max: Optional[float] = None  # exclusive; None means unbounded
+    count: int
+
+
+class SearchFacets(BaseModel):
+    status: Dict[str, int]
+    price: List[PriceFacet]
+
+
+class ProductSearchResponse(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    items: List[ProductResponse]
+    facets: SearchFacets
 
 
 #-------------------------------Order Schemas-----------------------------------
 class OrderCreate(BaseModel):
     product_id: int = Field(..., gt=0, example=1)
     quantity: int = Field(..., ge=1, description="Minimum order quantity is 1", example=2)
+    # Issued by the identity provider; there is no customers table here
+    customer_id: Optional[int] = Field(None, gt=0, example=42)
+
+
+class OrderFilters(BaseModel):
+    product_id: Optional[int] = Field(None, gt=0, example=1)
+    customer_id: Optional[int] = Field(None, gt=0, example=42)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
 
 
 class OrderResponse(BaseModel):
     id: int
     product_id: int
+    customer_id: Optional[int] = None
     quantity: int
     total_price: float
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+#-------------------------------Bulk Schemas------------------------------------
+class BulkItemResult(BaseModel):
+    index: int  # position of the item in the request payload
+    id: Optional[int] = None
+    status: Literal["created", "updated", "conflict", "not_found", "error"]
+    detail: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+#-----------------------------Analytics Schemas---------------------------------
+class SalesDay(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float
+
+
+class ProductSales(BaseModel):
+    product_id: int
+    orders: int
+    units: int
+    revenue: float
+
+
+class PaymentDay(BaseModel):
+    day: date
+    completed: int
+    failed: int
+    amount_completed: float
+    success_rate: Optional[float] = None  # completed / (completed + failed); None until one settles
+
+
+#------------------------------Event Schemas------------------------------------
+class ChangeEvent(BaseModel):
+    sequence: int  # stream position; pass the last one seen as ?after=
+    type: str
+    entity_id: int
+    payload: dict
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class EventPage(BaseModel):
+    events: List[ChangeEvent]
+    next_cursor: int  # equals ?after= when no new events arrived
 
 
 #------------------------------Payment Schemas----------------------------------
@@ -46,7 +169,8 @@ class PaymentRequest(BaseModel):
     amount: float = Field(..., gt=0, example=39.98)
     payment_method: str = Field(..., min_length=3, example="mpesa")
 
-    @validator("payment_method")
+    @field_validator("payment_method")
+    @classmethod
     def validate_method(cls, v):
         if v.lower() not in ["paypal", "stripe", "mpesa"]:
             raise ValueError("Invalid payment method. Must be 'paypal', 'stripe', or 'mpesa'")
@@ -57,11 +181,12 @@ class PaymentResponse(BaseModel):
     id: int
     status: Literal["pending", "completed", "failed"]
     order_id: Optional[int] = None
-    amount: Optional[float] = None
+    # models.Payment stores the amount as amount_paid
+    amount: Optional[float] = Field(None, validation_alias=AliasChoices("amount", "amount_paid"))
+    failure_reason: Optional[str] = None
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class PaymentVerifyResponse(BaseModel):
@@ -71,5 +196,11 @@ class PaymentVerifyResponse(BaseModel):
     amount: float
     payment_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+#---------------------------Expanded Order Schemas------------------------------
+class OrderDetail(OrderResponse):
+    # Only set, and only sent, when asked for with ?expand=product,payments
+    product: Optional[ProductResponse] = None
+    payments: Optional[List[PaymentResponse]] = None
@@ -0,0 +1,333 @@
+"""Shared-memory catalog snapshot.
+
+One refresher process per node (python -m app.snapshot) writes the whole
+catalog to CATALOG_SNAPSHOT_PATH as a columnar file, and every worker maps
+it read-only, so the pages are shared between workers and listings are
+served without touching the database.
+
+File layout (native byte order; the file never leaves the node):
+
+    header      magic, generation, row count, build time, metadata length
+    metadata    JSON: the distinct statuses and their row counts, padded to 8 bytes
+    ids         int64 per row, ascending
+    versions    int64 per row, for ETags
+    prices      float64 per row
+    quantities  int64 per row
+    offsets     int64 per row + 1, into the JSON blob
+    statuses    uint16 per row, indexes into the metadata's statuses; padded to 8 bytes
+    by status   int64 row numbers, ascending, grouped by status in metadata order
+    JSON blob   each row serialized as in GET /api/products, back to back
+
+Unfiltered and status-filtered pages are a binary search plus a slice.
+Price and date ranges would need a scan, so those pages are left to the
+indexed database query and the product cache.
+
+A new file is written next to the old one and renamed over it, then the
+generation in the version file (PATH.version: generation and the
+refresher's heartbeat, mapped by every worker) is bumped. Workers compare
+it with the generation they have mapped on every read and swap to the new
+file when it moves. Requests already reading the old file keep it until
+they finish.
+"""
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import namedtuple
+from typing import List, Optional
+
+from sqlalchemy import exists, select
+
+from . import config, crud, models, schemas
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CATSNAP1"
+HEADER = struct.Struct("=8sqqdq")  # magic, generation, rows, built_at, metadata length
+VERSION = struct.Struct("=qd")  # generation, refresher heartbeat (time.time())
+MAX_STATUSES = 2 ** 16  # status codes are uint16; write_snapshot refuses more
+
+# What crud.listing_etag and crud.next_cursor need from a row
+_Row = namedtuple("_Row", "id version")
+
+
+def _padded(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+# ---------------------------- Writing ---------------------------- #
+
+def write_snapshot(path: str, rows, generation: int):
+    """Write `rows` (crud.PRODUCT_LISTING_COLUMNS, in id order) to `path`.
+
+    The file is renamed into place, so a reader opening `path` sees either
+    the previous snapshot or this one, never a partial file.
+    """
+    ids, versions, prices, quantities = array("q"), array("q"), array("d"), array("q")
+    offsets, codes, blob = array("q", [0]), array("H"), bytearray()
+    statuses, by_status = {}, []  # status -> code; row numbers per code
+    for row in rows:
+        if row.status not in statuses:
+            if len(statuses) == MAX_STATUSES:
+                raise ValueError(f"More than {MAX_STATUSES} distinct product statuses")
+            statuses[row.status] = len(statuses)
+            by_status.append(array("q"))
+        codes.append(statuses[row.status])
+        by_status[codes[-1]].append(len(ids))
+        ids.append(row.id)
+        versions.append(row.version)
+        prices.append(row.price)
+        quantities.append(row.quantity)
+        blob += schemas.product_row_json.dump_json(crud.product_row(row))
+        offsets.append(len(blob))
+    metadata = json.dumps({"statuses": list(statuses), "counts": [len(positions) for positions in by_status]}).encode()
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, generation, len(ids), time.time(), len(metadata)))
+        f.write(metadata.ljust(_padded(len(metadata)), b"\0"))
+        for column in (ids, versions, prices, quantities, offsets):
+            column.tofile(f)
+        codes.tofile(f)
+        f.write(bytes(_padded(codes.itemsize * len(codes)) - codes.itemsize * len(codes)))
+        for positions in by_status:
+            positions.tofile(f)
+        f.write(blob)
+    os.replace(temporary, path)
+
+
+def _open_version_file(path: str, writable: bool = False):
+    """Map PATH.version; the refresher creates it if missing."""
+    version_path = f"{path}.version"
+    if writable and not os.path.exists(version_path):
+        with open(version_path, "ab") as f:
+            f.truncate(VERSION.size)
+    with open(version_path, "r+b" if writable else "rb") as f:
+        if writable:
+            # Held for the refresher's lifetime; a second refresher waits here as a standby
+            fcntl.flock(os.dup(f.fileno()), fcntl.LOCK_EX)
+        return mmap.mmap(f.fileno(), VERSION.size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+
+class SnapshotRefresher:
+    """Rebuilds the snapshot whenever products have changed.
+
+    Changes are detected from the outbox: every product write records a
+    product.* event, and the relay numbers events in commit order. Each tick
+    reads the last relayed sequence and rebuilds only if a product event was
+    relayed since the previous tick, so an idle catalog costs two indexed
+    lookups per interval. Unrelated order and payment events are skipped.
+    """
+
+    def __init__(self, path: str = config.CATALOG_SNAPSHOT_PATH, session_factory=SessionLocal,
+                 interval: float = config.CATALOG_SNAPSHOT_REFRESH_SECONDS):
+        self.path = path
+        self.session_factory = session_factory
+        self.interval = interval
+        self.sequence = None  # last relayed sequence seen; None until the first build
+        self._version = None
+
+    def _products_changed(self, db, sequence: int) -> bool:
+        if self.sequence is None or sequence < self.sequence:  # first run, or the outbox was reset
+            return True
+        if sequence == self.sequence:
+            return False
+        return db.scalar(select(exists().where(
+            models.OutboxEvent.sequence > self.sequence,
+            models.OutboxEvent.sequence <= sequence,
+            models.OutboxEvent.topic == "product",
+        )))
+
+    def refresh_once(self) -> bool:
+        """Rebuild if products changed, then record a heartbeat. Returns whether it rebuilt."""
+        if self._version is None:
+            self._version = _open_version_file(self.path, writable=True)
+        with self.session_factory() as db:
+            # Read before the products: a change relayed after this point is picked up next tick
+            sequence = db.scalar(select(models.OutboxCursor.last_sequence).where(models.OutboxCursor.id == 1)) or 0
+            changed = self._products_changed(db, sequence)
+            if changed:
+                rows = db.execute(select(*crud.PRODUCT_LISTING_COLUMNS).order_by(models.Product.id)
+                                  .execution_options(yield_per=config.STREAM_BATCH_SIZE))
+                generation = VERSION.unpack_from(self._version)[0] + 1
+                write_snapshot(self.path, rows, generation)
+                struct.pack_into("=q", self._version, 0, generation)
+            self.sequence = sequence
+        struct.pack_into("=d", self._version, 8, time.time())
+        return changed
+
+    def run(self, stop: threading.Event = None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                if self.refresh_once():
+                    logger.info(f"Catalog snapshot rebuilt at outbox sequence {self.sequence}")
+            except Exception:
+                # No heartbeat this tick; workers fall back to the database once it is stale
+                logger.exception("Catalog snapshot refresh failed; retrying")
+            stop.wait(self.interval)
+
+
+# ---------------------------- Reading ---------------------------- #
+
+class Snapshot:
+    """One mapped snapshot file. Columns are memoryviews over the mapping, so reads copy nothing."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, self.generation, self.rows, self.built_at, metadata_length = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        offset = HEADER.size
+        metadata = json.loads(bytes(view[offset:offset + metadata_length]))
+        self.statuses = metadata["statuses"]
+        offset += _padded(metadata_length)
+
+        def column(fmt: str, count: int):
+            nonlocal offset
+            size = struct.calcsize(fmt) * count
+            offset += size
+            return view[offset - size:offset].cast(fmt)
+
+        self.ids = column("q", self.rows)
+        self.versions = column("q", self.rows)
+        self.prices = column("d", self.rows)
+        self.quantities = column("q", self.rows)
+        self.offsets = column("q", self.rows + 1)
+        self.status_codes = column("H", self.rows)
+        offset = _padded(offset)
+        self.by_status = {status: column("q", count) for status, count in zip(self.statuses, metadata["counts"])}
+        self.blob = view[offset:]
+
+    def listing(self, filters: Optional[schemas.ProductFilters], limit: int, cursor: Optional[int]):
+        """The page crud.get_all_products_cached would return, as {"etag", "body", "next_cursor"}.
+
+        None when `filters` include a price or date range; those pages come from the database.
+        """
+        if filters is not None and any(value is not None for value in (
+                filters.min_price, filters.max_price, filters.created_after, filters.created_before)):
+            return None
+        limit = min(limit, config.MAX_PAGE_SIZE)
+        if filters is None or filters.status is None:
+            start = bisect.bisect_right(self.ids, cursor) if cursor is not None else 0
+            picked = range(start, min(start + limit, self.rows))
+        else:
+            positions = self.by_status.get(filters.status, ())
+            start = bisect.bisect_right(positions, cursor, key=self.ids.__getitem__) if cursor is not None else 0
+            picked = positions[start:start + limit]
+        rows = [_Row(self.ids[i], self.versions[i]) for i in picked]
+        return {
+            "etag": crud.listing_etag(rows),
+            "body": b"[" + b",".join(self.blob[self.offsets[i]:self.offsets[i + 1]] for i in picked) + b"]",
+            "next_cursor": crud.next_cursor(rows, limit),
+        }
+
+    def lookup(self, product_ids: List[int]):
+        """schemas.ProductPrice dicts for the ids that exist, in id order."""
+        found = []
+        for product_id in sorted(set(product_ids)):
+            i = bisect.bisect_left(self.ids, product_id)
+            if i < self.rows and self.ids[i] == product_id:
+                found.append({"id": product_id, "price": self.prices[i], "quantity": self.quantities[i],
+                              "status": self.statuses[self.status_codes[i]]})
+        return found
+
+
+class CatalogSnapshot:
+    """A worker's handle on the shared snapshot.
+
+    Every read checks the mapped version file (a memory read, no system
+    call) and swaps to the refresher's newest file when the generation has
+    moved. Reads return None, and the caller goes to the database, while
+    there is no snapshot yet or the refresher's heartbeat is older than
+    `max_age`.
+    """
+
+    # Seconds between attempts to open a version file that does not exist yet
+    RETRY_INTERVAL = 1.0
+
+    def __init__(self, path: str = config.CATALOG_SNAPSHOT_PATH,
+                 max_age: float = config.CATALOG_SNAPSHOT_MAX_AGE_SECONDS, clock=time.time):
+        self.path = path
+        self.max_age = max_age
+        self._clock = clock
+        self._version = None
+        self._snapshot = None
+        self._retry_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Snapshot]:
+        if not self.path:
+            return None
+        if self._version is None:
+            if time.monotonic() < self._retry_at:
+                return None
+            try:
+                self._version = _open_version_file(self.path)
+            except (OSError, ValueError):
+                self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+                return None
+        generation, heartbeat = VERSION.unpack_from(self._version)
+        if generation == 0 or self._clock() - heartbeat > self.max_age:
+            return None
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.generation < generation:
+            snapshot = self._swap(generation)
+        return snapshot
+
+    def _swap(self, generation: int) -> Optional[Snapshot]:
+        with self._lock:
+            if self._snapshot is None or self._snapshot.generation < generation:
+                try:
+                    self._snapshot = Snapshot(self.path)
+                except (OSError, ValueError):
+                    logger.exception("Could not map the catalog snapshot")
+                    return None
+            # The old mapping is unmapped once no request holds it any more
+            return self._snapshot
+
+    def listing(self, filters: Optional[schemas.ProductFilters], limit: int, cursor: Optional[int]):
+        snapshot = self.current()
+        return snapshot.listing(filters, limit, cursor) if snapshot is not None else None
+
+    def prices(self, product_ids: List[int]):
+        snapshot = self.current()
+        return snapshot.lookup(product_ids) if snapshot is not None else None
+
+    def stats(self):
+        snapshot = self.current()
+        if snapshot is None:
+            return {"enabled": bool(self.path), "serving": False}
+        return {
+            "enabled": True,
+            "serving": True,
+            "generation": snapshot.generation,
+            "products": snapshot.rows,
+            "bytes": len(snapshot._map),
+            "age_seconds": round(self._clock() - snapshot.built_at, 3),
+        }
+
+
+catalog = CatalogSnapshot()
+
+
+# ---------------------------- Refresher ---------------------------- #
+
+def main():
+    logging.basicConfig(level=config.LOG_LEVEL)
+    if not config.CATALOG_SNAPSHOT_PATH:
+        raise SystemExit("Set CATALOG_SNAPSHOT_PATH to the file the workers should map")
+    SnapshotRefresher().run()
+
+
+if __name__ == "__main__":
+    main()
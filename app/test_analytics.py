@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.payments import FakePaymentProvider, PaymentWorker
+
+TODAY = date.today()
+RANGE = (TODAY - timedelta(days=1), TODAY + timedelta(days=1))  # CURRENT_DATE is UTC; allow for the offset
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"timeout": 30})
+    models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    with factory() as db:
+        db.add_all([models.Product(name="Mug", price=4.5, quantity=100), models.Product(name="Lamp", price=20, quantity=100)])
+        db.commit()
+    yield factory
+    engine.dispose()
+
+def totals(db):
+    return [(row.product_id, row.orders, row.units, row.revenue) for row in crud.get_top_products(db, *RANGE)]
+
+def test_orders_are_counted_as_they_are_placed(session_factory):
+    def buy(args):
+        with session_factory() as db:
+            crud.create_order(db, schemas.OrderCreate(product_id=args[0], quantity=args[1]))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(buy, [(1, 2)] * 20 + [(2, 1)] * 5))
+    with session_factory() as db:
+        crud.bulk_create_orders(db, [schemas.OrderCreate(product_id=2, quantity=1),
+                                     schemas.OrderCreate(product_id=1, quantity=999)])  # second line fails
+        assert totals(db) == [(1, 20, 40, 180.0), (2, 6, 6, 120.0)]
+        [day] = crud.get_sales_by_day(db, *RANGE)
+        assert (day.orders, day.units, day.revenue) == (26, 46, 300.0)
+        assert [d.units for d in crud.get_sales_by_day(db, *RANGE, product_id=2)] == [6]
+
+def test_rejected_orders_are_not_counted(session_factory):
+    with session_factory() as db:
+        with pytest.raises(HTTPException):
+            crud.create_order(db, schemas.OrderCreate(product_id=1, quantity=101))
+        assert totals(db) == []
+
+def test_settled_payments_give_daily_success_rate(session_factory):
+    with session_factory() as db:
+        order = crud.create_order(db, schemas.OrderCreate(product_id=1, quantity=2))
+        payment_ids = [crud.create_payment(db, schemas.PaymentRequest(order_id=order.id, amount=amount, payment_method="mpesa"))[0].id
+                       for amount in (9.0, 9.0, 1.0)]  # the last one is short and fails
+    worker = PaymentWorker(FakePaymentProvider(latency_ms=0), session_factory=session_factory)
+    for payment_id in payment_ids + payment_ids:  # settling twice must not count twice
+        worker.process(payment_id)
+    with session_factory() as db:
+        [day] = crud.get_payment_stats(db, *RANGE)
+        assert (day.completed, day.failed, day.amount_completed, day.success_rate) == (2, 1, 18.0, 0.6667)
+
+def test_rebuild_matches_incremental_rollups(session_factory):
+    with session_factory() as db:
+        for product_id, quantity in [(1, 1), (2, 3), (1, 4)]:
+            crud.create_order(db, schemas.OrderCreate(product_id=product_id, quantity=quantity))
+        incremental = totals(db)
+        crud.rebuild_rollups(db)
+        assert totals(db) == incremental
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+
+# Requests whose answers must not depend on DB_MODE, errors included
+PARITY_REQUESTS = [
+    ("GET", "/api/products?limit=2", None),
+    ("GET", "/api/products?status=Sold", None),
+    ("GET", "/api/products?limit=0", None),
+    ("GET", "/api/products?min_price=5&max_price=1", None),
+    ("GET", "/api/products/1", None),
+    ("GET", "/api/products/999", None),
+    ("GET", "/api/products/prices?ids=1,2,999", None),
+    ("GET", "/api/products/prices?ids=a", None),
+    ("POST", "/api/products", {"name": "X", "price": 1, "quantity": 1}),
+    ("PUT", "/api/products/999", {"name": "Lamp", "price": 1, "quantity": 1}),
+    ("PUT", "/api/products/999/status", None),
+    ("DELETE", "/api/products/999", None),
+    ("POST", "/api/orders", {"product_id": 1, "quantity": 100}),
+    ("POST", "/api/orders", {"product_id": 3, "quantity": 1}),
+    ("POST", "/api/orders", {"product_id": 999, "quantity": 1}),
+    ("GET", "/api/orders?expand=product,payments", None),
+    ("GET", "/api/orders?expand=customer", None),
+    ("GET", "/api/orders/1?expand=payments", None),
+    ("GET", "/api/orders/999", None),
+    ("GET", "/api/customers/7/orders", None),
+    ("POST", "/api/payments", {"order_id": 999, "amount": 10, "payment_method": "stripe"}),
+    ("GET", "/api/payments/1", None),
+    ("GET", "/api/payments/999", None),
+]
+
+# Routes only routes.py serves; in async mode they are reached through async_routes.sync_fallback_router
+SYNC_ONLY_REQUESTS = [
+    ("GET", "/api/products/search?q=lamp", None),
+    ("POST", "/api/products/bulk", [{"name": "Desk fan", "price": 30, "quantity": 2}]),
+    ("PUT", "/api/products/bulk", [{"id": 1, "name": "Desk lamp", "price": 25, "quantity": 3}]),
+    ("POST", "/api/orders/bulk", [{"product_id": 1, "quantity": 1}]),
+    ("GET", "/api/analytics/sales", None),
+    ("GET", "/api/analytics/payments", None),
+    ("GET", "/api/events?topics=product", None),
+]
+
+
+@pytest.fixture
+def catalog(database):
+    with sessionmaker(bind=database, autoflush=False)() as db:
+        lamp = crud.create_product(db, schemas.ProductCreate(name="Desk lamp", price=20, quantity=5))
+        crud.create_product(db, schemas.ProductCreate(name="Floor lamp", price=60, quantity=1))
+        crud.mark_product_sold(db, crud.create_product(db, schemas.ProductCreate(name="Old lamp", price=5, quantity=1)).id)
+        order = crud.create_order(db, schemas.OrderCreate(product_id=lamp.id, quantity=2, customer_id=7))
+        db.add(models.Payment(order_id=order.id, amount_paid=40, payment_method="stripe",
+                              status=models.PaymentStatusEnum.completed))
+        db.commit()
+
+def answers(client, requests):
+    results = []
+    for method, url, body in requests:
+        response = client.request(method, url, json=body)
+        headers = {name: response.headers.get(name) for name in ("ETag", "X-Next-Cursor", "Cache-Control")}
+        results.append((method, url, response.status_code, response.content, headers))
+    return results
+
+def test_async_mode_answers_like_sync_mode(serve, catalog):
+    # Every request fails or writes nothing, so both modes see the same data
+    with serve("sync") as client:
+        sync = answers(client, PARITY_REQUESTS)
+    with serve("async") as client:
+        assert answers(client, PARITY_REQUESTS) == sync
+    assert {status for _, _, status, _, _ in sync} >= {200, 400, 404, 409, 422}
+
+@pytest.mark.parametrize("method, url, body", SYNC_ONLY_REQUESTS)
+def test_sync_only_routes_are_served_in_async_mode(serve, catalog, method, url, body):
+    with serve("async") as client:
+        response = client.request(method, url, json=body)
+    assert response.status_code == 200, response.text
@@ -0,0 +1,54 @@
+from app import config
+
+
+def product(i, **fields):
+    return {"name": f"Product {i}", "price": 10 + i, "quantity": 5, **fields}
+
+def test_bulk_create_products(client):
+    response = client.post("/api/products/bulk", json=[product(i) for i in range(3)])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (3, 0)
+    assert [result["status"] for result in body["results"]] == ["created"] * 3
+    ids = [result["id"] for result in body["results"]]
+    assert [client.get(f"/api/products/{i}").json()["name"] for i in ids] == ["Product 0", "Product 1", "Product 2"]
+
+def test_bulk_upsert_updates_creates_and_reports_missing(client):
+    existing = client.post("/api/products/bulk", json=[product(0)]).json()["results"][0]["id"]
+    response = client.put("/api/products/bulk", json=[
+        product(0, id=existing, price=99), product(1), product(2, id=existing + 100)])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    assert [result["status"] for result in body["results"]] == ["updated", "created", "not_found"]
+    assert client.get(f"/api/products/{existing}").json()["price"] == 99
+
+def test_bulk_upsert_rejects_duplicate_ids(client):
+    existing = client.post("/api/products/bulk", json=[product(0)]).json()["results"][0]["id"]
+    response = client.put("/api/products/bulk", json=[
+        product(0, id=existing, price=1), product(1), product(0, id=existing, price=2)])
+    assert response.status_code == 422
+    assert str(existing) in response.json()["error"]["message"]
+    assert client.get(f"/api/products/{existing}").json()["price"] == 10  # nothing was written
+
+def test_bulk_orders_fail_line_by_line(client):
+    ids = [result["id"] for result in client.post("/api/products/bulk", json=[product(0), product(1)]).json()["results"]]
+    response = client.post("/api/orders/bulk", json=[
+        {"product_id": ids[0], "quantity": 6},
+        {"product_id": ids[0], "quantity": 3},
+        {"product_id": ids[0], "quantity": 3},  # only 2 left after the line before
+        {"product_id": ids[1], "quantity": 1},
+        {"product_id": ids[1] + 100, "quantity": 1},
+    ])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["conflict", "created", "conflict", "created", "not_found"]
+    assert results[0]["detail"] == "Insufficient stock: 5 left."
+    assert results[2]["detail"] == "Insufficient stock: 2 left."  # not the stock line 0 saw
+    assert client.get(f"/api/products/{ids[0]}").json()["quantity"] == 2
+
+def test_bulk_payloads_over_the_limit_are_rejected(client):
+    too_many = [product(0)] * (config.BULK_MAX_ITEMS + 1)
+    assert client.post("/api/products/bulk", json=too_many).status_code == 422
+    assert client.put("/api/products/bulk", json=too_many).status_code == 422
+    assert client.post("/api/orders/bulk", json=[{"product_id": 1, "quantity": 1}] * (config.BULK_MAX_ITEMS + 1)).status_code == 422
@@ -0,0 +1,73 @@
+from app.cache import MISSING, InMemoryCache, ProductCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    backend = InMemoryCache(clock=clock)
+    backend.set("a", 1, ttl=10)
+    clock.now = 9.9
+    assert backend.get("a") == 1
+    clock.now = 10
+    assert backend.get("a") is MISSING
+
+def test_least_recently_used_entry_is_evicted():
+    backend = InMemoryCache(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")  # "b" is now the least recently used
+    backend.set("c", 3, ttl=60)
+    assert backend.get("b") is MISSING
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+
+def test_product_read_through_and_invalidation():
+    cache = ProductCache(InMemoryCache(), ttl=60, enabled=True)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"id": 1, "name": f"v{len(loads)}"}
+
+    assert cache.get_product(1, loader)["name"] == "v1"
+    assert cache.get_product(1, loader)["name"] == "v1"
+    cache.invalidate_product(1)
+    assert cache.get_product(1, loader)["name"] == "v2"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_any_product_write_drops_cached_listings():
+    cache = ProductCache(InMemoryCache(), ttl=60, enabled=True)
+    pages = iter([[{"id": 1}], [{"id": 1}, {"id": 2}]])
+    loader = lambda: next(pages)
+
+    assert cache.get_listing("{}:50:None", loader) == [{"id": 1}]
+    assert cache.get_listing("{}:50:None", loader) == [{"id": 1}]
+    cache.invalidate_listings()
+    assert cache.get_listing("{}:50:None", loader) == [{"id": 1}, {"id": 2}]
+
+def test_evicting_entries_never_brings_back_old_listings():
+    backend = InMemoryCache(max_entries=2)
+    cache = ProductCache(backend, ttl=60, enabled=True)
+    pages = iter([[{"id": 1}], [{"id": 1}, {"id": 2}]])
+    loader = lambda: next(pages)
+
+    assert cache.get_listing("{}:50:None", loader) == [{"id": 1}]
+    cache.invalidate_listings()
+    backend.get("products:list:0:{}:50:None")  # the pre-write page is used more recently than anything else
+    cache.get_product(1, lambda: {"id": 1})  # evicts the least recently used entry
+    assert cache.get_listing("{}:50:None", loader) == [{"id": 1}, {"id": 2}]
+
+def test_disabled_cache_always_loads():
+    cache = ProductCache(InMemoryCache(), ttl=60, enabled=False)
+    loads = []
+    cache.get_product(1, lambda: loads.append(1))
+    cache.get_product(1, lambda: loads.append(1))
+    assert len(loads) == 2
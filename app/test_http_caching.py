@@ -0,0 +1,53 @@
+import pytest
+from fastapi.middleware.gzip import GZipMiddleware
+
+from app import config, main
+
+
+def add_products(client, count):
+    payload = [{"name": f"Product {i}", "description": "A sturdy thing " * 4, "price": 10, "quantity": 5}
+               for i in range(count)]
+    return [result["id"] for result in client.post("/api/products/bulk", json=payload).json()["results"]]
+
+@pytest.mark.parametrize("path", ["/api/products", "/api/products/{id}"])
+def test_etag_and_not_modified(client, path):
+    product_id = add_products(client, 3)[0]
+    path = path.format(id=product_id)
+    first = client.get(path)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == config.CATALOG_CACHE_CONTROL
+
+    for if_none_match in (etag, f'"other", {etag}', etag.removeprefix("W/"), "*"):
+        cached = client.get(path, headers={"If-None-Match": if_none_match})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert (cached.headers["ETag"], cached.headers["Cache-Control"]) == (etag, config.CATALOG_CACHE_CONTROL)
+    assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+    client.put(f"/api/products/{product_id}", json={"name": "Renamed", "price": 11, "quantity": 5})
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+def test_large_responses_are_gzipped_when_accepted(client):
+    add_products(client, 20)
+    response = client.get("/api/products", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(response.json()) == 20  # decoded by the client
+    assert "Content-Encoding" not in client.get("/api/products", headers={"Accept-Encoding": "identity"}).headers
+    small = client.get("/api/products?limit=1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers  # under COMPRESSION_MIN_SIZE
+
+def test_compression_level_is_configurable(monkeypatch):
+    monkeypatch.setattr(config, "COMPRESSION_LEVEL", 3)
+    gzipped = [m for m in main.create_app().user_middleware if m.cls is GZipMiddleware]
+    assert gzipped[0].kwargs["compresslevel"] == 3
+
+def test_brotli_is_negotiated(serve, monkeypatch):
+    monkeypatch.setattr(config, "COMPRESSION", "br")
+    with serve("sync") as client:
+        add_products(client, 20)
+        gzip_only = client.get("/api/products", headers={"Accept-Encoding": "gzip"})
+        assert gzip_only.headers["Content-Encoding"] == "gzip"  # fallback, with or without brotli-asgi
+        pytest.importorskip("brotli_asgi")
+        assert client.get("/api/products", headers={"Accept-Encoding": "br, gzip"}).headers["Content-Encoding"] == "br"
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from app import config
+
+
+def add_products(client, count):
+    payload = [{"name": f"Product {i}", "price": 1 + i % 4, "quantity": 5} for i in range(count)]
+    return [result["id"] for result in client.post("/api/products/bulk", json=payload).json()["results"]]
+
+def pages(client, **params):
+    """Follow X-Next-Cursor from the first page; returns the ids of every page."""
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/products", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.append([product["id"] for product in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+        assert int(cursor) == seen[-1][-1]
+
+def test_cursor_pages_cover_every_product_once(client):
+    ids = add_products(client, 7)
+    assert pages(client, limit=3) == [ids[:3], ids[3:6], ids[6:]]
+
+def test_full_last_page_is_followed_by_an_empty_one(client):
+    ids = add_products(client, 6)
+    assert pages(client, limit=3) == [ids[:3], ids[3:], []]
+
+def test_cursor_pages_keep_the_filters(client):
+    ids = add_products(client, 12)
+    cheap = [product_id for i, product_id in enumerate(ids) if 1 + i % 4 <= 2]
+    assert sum(pages(client, limit=2, max_price=2), []) == cheap
+
+@pytest.mark.parametrize("params", [
+    {"min_price": 5, "max_price": 2},
+    {"created_after": "2026-02-01T00:00:00Z", "created_before": "2026-01-01T00:00:00Z"},
+])
+def test_empty_ranges_are_rejected(client, params):
+    response = client.get("/api/products", params=params)
+    assert response.status_code == 422
+    assert response.json()["error"]["code"] == 422
+
+@pytest.mark.parametrize("params", [{"limit": config.MAX_PAGE_SIZE + 1}, {"limit": 0}, {"min_price": -1}])
+def test_out_of_range_parameters_are_rejected(client, params):
+    assert client.get("/api/products", params=params).status_code == 422
+
+def test_stream_exports_every_match_as_ndjson(client):
+    ids = add_products(client, 7)
+    response = client.get("/api/products", params={"stream": "true", "limit": 2, "min_price": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [product["id"] for product in lines] == [product_id for i, product_id in enumerate(ids) if 1 + i % 4 >= 2]
+    assert "X-Next-Cursor" not in response.headers  # the whole export, not a page
+
+def test_empty_order_range_is_rejected(client):
+    params = {"created_after": "2026-02-01T00:00:00Z", "created_before": "2026-01-01T00:00:00Z"}
+    response = client.get("/api/orders", params=params)
+    assert response.status_code == 422
+    assert response.json()["error"]["code"] == 422
+    assert client.get("/api/orders", params={"created_before": "2026-01-01T00:00:00Z"}).status_code == 200
+
+def test_orders_stream_cannot_expand(client):
+    response = client.get("/api/orders", params={"stream": "true", "expand": "product"})
+    assert response.status_code == 400
+    assert client.get("/api/orders", params={"stream": "true"}).status_code == 200
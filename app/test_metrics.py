@@ -0,0 +1,53 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import config, metrics
+
+
+def make_app(**options):
+    app = FastAPI()
+
+    @app.get("/api/products/{product_id}")
+    def lookup(product_id: int):
+        return {"id": product_id}
+
+    return TestClient(metrics.MetricsMiddleware(app, **options))
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "/a")
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{route="/a",le="0.1"} 2',  # le is inclusive
+        'test_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_seconds_sum{route="/a"} 2.65',
+        'test_seconds_count{route="/a"} 4',
+    ]
+
+def test_requests_are_recorded_by_route_template():
+    make_app(sample_rate=0).get("/api/products/7")
+    assert any(line.startswith('http_request_duration_seconds_count{method="GET",route="/api/products/{product_id}",'
+                               'status="200"}') for line in metrics.REQUEST_LATENCY.render())
+
+def test_server_timing_needs_the_setting_or_the_token():
+    assert "server-timing" not in make_app(sample_rate=1).get("/api/products/1").headers
+    assert make_app(sample_rate=1, server_timing=True).get("/api/products/1").headers["server-timing"].startswith("app;dur=")
+
+    client = make_app(sample_rate=0, token="secret")
+    assert "server-timing" not in client.get("/api/products/1").headers
+    assert "server-timing" not in client.get("/api/products/1", headers={"Authorization": "Bearer wrong"}).headers
+    trusted = client.get("/api/products/1", headers={"Authorization": "Bearer secret"})
+    assert 'desc="0 queries"' in trusted.headers["server-timing"]  # profiled although the sample rate is 0
+
+def test_metrics_endpoint(client, monkeypatch):
+    client.get("/api/products")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'route="/api/products"' in response.text
+    assert "db_query_duration_seconds_count" in response.text
+
+    monkeypatch.setattr(config, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
@@ -0,0 +1,74 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models, routes, schemas
+
+
+@pytest.fixture
+def engine():
+    # One shared in-memory connection, so the TestClient's thread sees the same data
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+        products = [crud.create_product(db, schemas.ProductCreate(name=f"P{i}", price=2, quantity=100))
+                    for i in range(5)]
+        for i in range(20):
+            order = crud.create_order(db, schemas.OrderCreate(
+                product_id=products[i % 5].id, quantity=1, customer_id=1 + i % 2))
+            db.add(models.Payment(order_id=order.id, amount_paid=2, payment_method="stripe"))
+        db.commit()
+        db.expunge_all()
+        yield db
+
+@pytest.fixture
+def queries(engine):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    yield statements
+    event.remove(engine, "before_cursor_execute", listener)
+
+def render(orders, expand):
+    return [routes._order_view(order, expand).model_dump(exclude_unset=True) for order in orders]
+
+def test_unexpanded_page_is_one_query(db, queries):
+    views = render(crud.get_all_orders(db, limit=20), set())
+    assert len(queries) == 1
+    assert len(views) == 20 and "product" not in views[0] and "payments" not in views[0]
+
+@pytest.mark.parametrize("limit", [5, 20])
+def test_expanded_page_costs_the_same_whatever_its_size(db, queries, limit):
+    views = render(crud.get_all_orders(db, limit=limit, expand={"product", "payments"}), {"product", "payments"})
+    assert len(queries) == 2  # orders joined to products, then every page's payments in one IN query
+    assert len(views) == limit
+    assert all(view["product"]["id"] == view["product_id"] for view in views)
+    assert all(len(view["payments"]) == 1 for view in views)
+
+def test_customer_history_pages_newest_first(db, queries):
+    first = crud.get_customer_orders(db, customer_id=1, limit=6)
+    second = crud.get_customer_orders(db, customer_id=1, limit=6, cursor=crud.next_cursor(first, 6))
+    ids = [order.id for order in first + second]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 10
+    assert {order.customer_id for order in first + second} == {1}
+    assert crud.next_cursor(second, 6) is None
+    assert len(queries) == 2
+
+def test_unknown_expansion_is_rejected(db):
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    app.dependency_overrides[routes.get_read_db] = lambda: db
+    client = TestClient(app)
+
+    assert client.get("/api/orders", params={"expand": "customer"}).status_code == 400
+    order = client.get("/api/customers/2/orders", params={"limit": 1, "expand": "product"}).json()[0]
+    assert order["customer_id"] == 2 and order["product"]["id"] == order["product_id"]
+    assert "payments" not in order
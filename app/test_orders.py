@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file database so every worker thread gets its own connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'orders.db'}", connect_args={"timeout": 30})
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+def add_product(session_factory, quantity, price=12.5):
+    with session_factory() as db:
+        product = models.Product(name="Limited sneaker", price=price, quantity=quantity)
+        db.add(product)
+        db.commit()
+        return product.id
+
+def test_order_computes_total_and_decrements_stock(session_factory):
+    product_id = add_product(session_factory, quantity=5)
+    with session_factory() as db:
+        order = crud.create_order(db, schemas.OrderCreate(product_id=product_id, quantity=2))
+        assert order.total_price == 25.0
+        product = db.get(models.Product, product_id)
+        assert product.quantity == 3
+        assert product.status == "available"
+
+def test_order_for_more_than_stock_is_a_conflict(session_factory):
+    product_id = add_product(session_factory, quantity=1)
+    with session_factory() as db:
+        with pytest.raises(HTTPException) as exc:
+            crud.create_order(db, schemas.OrderCreate(product_id=product_id, quantity=2))
+        assert exc.value.status_code == 409
+        assert db.get(models.Product, product_id).quantity == 1
+
+def test_order_for_missing_product_is_not_found(session_factory):
+    with session_factory() as db:
+        with pytest.raises(HTTPException) as exc:
+            crud.create_order(db, schemas.OrderCreate(product_id=999, quantity=1))
+        assert exc.value.status_code == 404
+
+def test_concurrent_checkout_never_oversells(session_factory):
+    stock, buyers = 10, 60
+    product_id = add_product(session_factory, quantity=stock)
+
+    def buy(_):
+        with session_factory() as db:
+            try:
+                crud.create_order(db, schemas.OrderCreate(product_id=product_id, quantity=1))
+                return 201
+            except HTTPException as exc:
+                return exc.status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(buy, range(buyers)))
+
+    assert outcomes.count(201) == stock
+    assert outcomes.count(409) == buyers - stock
+    with session_factory() as db:
+        product = db.get(models.Product, product_id)
+        assert product.quantity == 0
+        assert product.status == "Sold"
+        assert db.query(models.Order).filter(models.Order.product_id == product_id).count() == stock
+
+@pytest.mark.parametrize("restock", ["single", "bulk"])
+def test_sold_out_product_can_be_ordered_after_a_restock(client, restock):
+    product = {"name": "Limited sneaker", "price": 12.5, "quantity": 1}
+    product_id = client.post("/api/products", json=product).json()["id"]
+    assert client.post("/api/orders", json={"product_id": product_id, "quantity": 1}).status_code == 201
+    assert client.get(f"/api/products/{product_id}").json()["status"] == "Sold"
+
+    restocked = {**product, "quantity": 4}
+    if restock == "single":
+        assert client.put(f"/api/products/{product_id}", json=restocked).status_code == 200
+    else:
+        assert client.put("/api/products/bulk", json=[{**restocked, "id": product_id}]).json()["succeeded"] == 1
+    assert client.get(f"/api/products/{product_id}").json()["status"] == "available"
+    assert client.post("/api/orders", json={"product_id": product_id, "quantity": 4}).status_code == 201
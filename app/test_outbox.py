@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.outbox import EventNotifier, EventPublisher, OutboxRelay
+
+
+class RecordingPublisher(EventPublisher):
+    def __init__(self):
+        self.batches = []
+
+    def publish(self, events):
+        self.batches.append([event.type for event in events])
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+def event_types(db):
+    return db.scalars(select(models.OutboxEvent.type).order_by(models.OutboxEvent.id)).all()
+
+def test_events_are_written_with_the_change(session_factory):
+    with session_factory() as db:
+        product = crud.create_product(db, schemas.ProductCreate(name="Mug", price=4.5, quantity=2))
+        crud.create_order(db, schemas.OrderCreate(product_id=product.id, quantity=2))
+        with pytest.raises(HTTPException):
+            crud.create_order(db, schemas.OrderCreate(product_id=product.id, quantity=1))  # out of stock
+        assert event_types(db) == ["product.created", "product.stock_changed", "order.created"]
+        stock = db.scalars(select(models.OutboxEvent).where(models.OutboxEvent.type == "product.stock_changed")).one()
+        assert stock.payload == {"id": product.id, "quantity": 0, "status": "Sold", "version": 2}
+        assert stock.sequence is None  # not relayed yet
+
+def test_relay_numbers_events_in_batches(session_factory):
+    publisher, notifier = RecordingPublisher(), EventNotifier()
+    relay = OutboxRelay(publisher, session_factory, notifier, batch_size=2)
+    with session_factory() as db:
+        crud.bulk_create_products(db, [schemas.ProductCreate(name=f"P{i}", price=1, quantity=1) for i in range(3)])
+
+    assert [relay.relay_once(), relay.relay_once(), relay.relay_once()] == [2, 1, 0]
+    assert publisher.batches == [["product.created"] * 2, ["product.created"]]
+    assert notifier.latest == 3
+    with session_factory() as db:
+        events = db.scalars(select(models.OutboxEvent).order_by(models.OutboxEvent.id)).all()
+        assert [event.sequence for event in events] == [1, 2, 3]
+        assert all(event.published_at is not None for event in events)
+
+def test_get_events_pages_by_sequence(session_factory):
+    relay = OutboxRelay(EventPublisher(), session_factory)
+    with session_factory() as db:
+        product = crud.create_product(db, schemas.ProductCreate(name="Mug", price=4.5, quantity=5))
+        crud.create_order(db, schemas.OrderCreate(product_id=product.id, quantity=1))
+        crud.record_event(db, "product.updated", product.id, {"id": product.id})  # not committed: never seen
+        relay.relay_once()
+        db.rollback()
+
+        assert [e.type for e in crud.get_events(db)] == ["product.created", "product.stock_changed", "order.created"]
+        assert [e.sequence for e in crud.get_events(db, after=1, limit=1)] == [2]
+        assert [e.type for e in crud.get_events(db, topics=["order"])] == ["order.created"]
+        assert crud.get_events(db, after=3) == []
+
+def test_long_poll_wakes_when_a_batch_is_relayed():
+    notifier = EventNotifier()
+
+    async def wait():
+        started = time.monotonic()
+        threading.Timer(0.05, notifier.notify, args=(7,)).start()
+        await notifier.wait(0, timeout=5)
+        woke_after = time.monotonic() - started
+        await notifier.wait(0, timeout=5)  # already behind: returns at once
+        return woke_after, time.monotonic() - started
+
+    woke_after, total = asyncio.run(wait())
+    assert woke_after < 1
+    assert total - woke_after < 0.1
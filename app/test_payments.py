@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.payments import FakePaymentProvider, PaymentWorker, load_provider
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'payments.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    with factory() as db:
+        db.add(models.Product(id=1, name="Desk lamp", price=20, quantity=5))
+        db.add(models.Order(id=1, product_id=1, quantity=2, total_price=40))
+        db.commit()
+    yield factory
+    engine.dispose()
+
+def request(amount=40.0):
+    return schemas.PaymentRequest(order_id=1, amount=amount, payment_method="stripe")
+
+def test_same_idempotency_key_returns_the_original_payment(session_factory):
+    with session_factory() as db:
+        first, created = crud.create_payment(db, request(), "key-123")
+        again, created_again = crud.create_payment(db, request(), "key-123")
+        assert created and not created_again
+        assert again.id == first.id
+        assert db.query(models.Payment).count() == 1
+
+def test_reusing_a_key_for_another_request_is_a_conflict(session_factory):
+    with session_factory() as db:
+        crud.create_payment(db, request(), "key-123")
+        with pytest.raises(HTTPException) as exc:
+            crud.create_payment(db, request(amount=10), "key-123")
+        assert exc.value.status_code == 409
+
+def test_worker_settles_pending_payments(session_factory):
+    with session_factory() as db:
+        paid, _ = crud.create_payment(db, request(), "full")
+        short, _ = crud.create_payment(db, request(amount=5), "short")
+        assert paid.status == models.PaymentStatusEnum.pending
+
+    worker = PaymentWorker(FakePaymentProvider(latency_ms=0, failure_rate=0), session_factory, workers=2)
+    worker.start()
+    worker.recover_pending()
+    worker.queue.join()
+    worker.stop()
+
+    with session_factory() as db:
+        assert db.get(models.Payment, paid.id).status == models.PaymentStatusEnum.completed
+        failed = db.get(models.Payment, short.id)
+        assert failed.status == models.PaymentStatusEnum.failed
+        assert "does not cover" in failed.failure_reason
+
+class CountingProvider(FakePaymentProvider):
+    def __init__(self, calls):
+        super().__init__(latency_ms=0, failure_rate=0)
+        self.calls = calls
+
+    def verify(self, payment, order_total):
+        self.calls.append(payment.id)
+        return super().verify(payment, order_total)
+
+def test_settled_payment_is_not_processed_twice(session_factory):
+    calls = []
+
+    with session_factory() as db:
+        payment, _ = crud.create_payment(db, request(), "once")
+    worker = PaymentWorker(CountingProvider(calls), session_factory, workers=1)
+    worker.process(payment.id)
+    worker.process(payment.id)
+    assert calls == [payment.id]
+
+def test_claimed_payment_is_left_to_its_worker(session_factory):
+    with session_factory() as db:
+        payment, _ = crud.create_payment(db, request(), "claimed")
+    holder = PaymentWorker(CountingProvider([]), session_factory)
+    with session_factory() as db:
+        assert holder.claim(db, payment.id)  # another process is calling the provider
+
+    calls = []
+    other = PaymentWorker(CountingProvider(calls), session_factory)
+    other.recover_pending()
+    assert other.queue.empty()
+    other.process(payment.id)  # e.g. still in this process's queue from before the claim
+    assert calls == []
+
+def test_expired_lease_is_recovered(session_factory):
+    with session_factory() as db:
+        payment_id = crud.create_payment(db, request(), "abandoned")[0].id
+        db.get(models.Payment, payment_id).lease_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.commit()  # its worker died mid-call
+
+    calls = []
+    worker = PaymentWorker(CountingProvider(calls), session_factory)
+    worker.recover_pending()
+    worker.process(worker.queue.get_nowait())
+    assert calls == [payment_id]
+    with session_factory() as db:
+        settled = db.get(models.Payment, payment_id)
+        assert settled.status == models.PaymentStatusEnum.completed
+        assert settled.lease_until is None
+
+def test_provider_is_configurable():
+    assert isinstance(load_provider("app.payments:FakePaymentProvider"), FakePaymentProvider)
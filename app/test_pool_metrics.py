@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app import config, pool_metrics
+from app.database import engine_options
+
+
+def test_sqlite_keeps_the_default_pool():
+    assert engine_options("sqlite:///catalog.db", "test") == {}
+
+def test_postgres_gets_a_timed_pool_and_statement_timeout(monkeypatch):
+    monkeypatch.setattr(config, "DB_STATEMENT_TIMEOUT_MS", 1500)
+    options = engine_options("postgresql://app@db/shop", "options-test")
+    assert issubclass(options["poolclass"], QueuePool)
+    assert options["poolclass"].stats is pool_metrics.get_stats("options-test")
+    assert (options["pool_size"], options["max_overflow"]) == (config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW)
+    assert options["connect_args"] == {"options": "-c statement_timeout=1500"}
+
+    async_options = engine_options("postgresql+asyncpg://app@db/shop", "options-test-async", AsyncAdaptedQueuePool)
+    assert issubclass(async_options["poolclass"], AsyncAdaptedQueuePool)
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "1500"}}
+
+def test_timed_pool_records_checkouts_and_timeouts(tmp_path):
+    pool_class = pool_metrics.timed_pool_class("timed-test", QueuePool)
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=pool_class,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    pool_metrics.instrument("timed-test", engine)
+    with engine.connect() as held:
+        held.execute(text("SELECT 1"))
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    engine.dispose()  # recreates the pool; the counts carry over
+
+    stats = pool_metrics.snapshot()["timed-test"]
+    assert (stats["checkouts"], stats["checkins"], stats["connects"], stats["timeouts"]) == (2, 1, 1, 1)
+    assert stats["wait_max_ms"] >= 50  # the second caller waited out pool_timeout
+    assert stats["pool"] == "TimedQueuePool"
+
+def test_monitoring_routes(client, monkeypatch):
+    stats = client.get("/api/pool-stats").json()
+    assert "primary" in stats and "checkouts" in stats["primary"]
+    assert client.get("/api/cache-stats").status_code == 200
+
+    monkeypatch.setattr(config, "METRICS_TOKEN", "secret")
+    for path in ("/api/pool-stats", "/api/replica-stats", "/api/cache-stats", "/api/snapshot-stats"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer secret"}).status_code == 200
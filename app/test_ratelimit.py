@@ -0,0 +1,102 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import pool_metrics
+from app.ratelimit import InMemoryTokenBuckets, LoadShedMiddleware, RateLimiter, RateLimitMiddleware, _networks, client_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/api/products")
+    def listing():
+        return []
+
+    @app.get("/api/products/{product_id}")
+    def lookup(product_id: int):
+        return {"id": product_id}
+
+    @app.post("/api/orders")
+    def checkout():
+        return {}
+
+    return app
+
+def test_bucket_refills_at_rate_up_to_burst():
+    clock = FakeClock()
+    buckets = InMemoryTokenBuckets(clock=clock)
+    assert buckets.take("a", 4, rate=2, burst=5) == (True, 0.0)
+    assert buckets.take("a", 4, rate=2, burst=5) == (False, 1.5)  # 1 token left, 3 more at 2/s
+    clock.now = 1.5
+    assert buckets.take("a", 4, rate=2, burst=5)[0]
+    clock.now = 100
+    assert buckets.take("a", 5, rate=2, burst=5)[0]  # refill is capped at the burst
+    assert not buckets.take("a", 1, rate=2, burst=5)[0]
+    assert buckets.take("b", 1, rate=2, burst=5)[0]  # buckets are per client
+
+def test_least_recently_seen_client_is_dropped():
+    buckets = InMemoryTokenBuckets(max_clients=2, clock=FakeClock())
+    for key in ("a", "b", "c"):
+        buckets.take(key, 5, rate=1, burst=5)
+    assert buckets.take("a", 5, rate=1, burst=5)[0]  # "a" was evicted and starts with a full bucket
+    assert not buckets.take("c", 5, rate=1, burst=5)[0]
+
+def test_listings_cost_more_than_lookups_and_clients_are_separate():
+    limiter = RateLimiter(InMemoryTokenBuckets(clock=FakeClock()), rate=1, burst=10,
+                          route_costs={"GET /api/products": 5}, api_keys={"partner"})
+    client = TestClient(RateLimitMiddleware(make_app(), limiter))
+    assert [client.get("/api/products").status_code for _ in range(3)] == [200, 200, 429]
+    assert client.get("/api/products/1").status_code == 429
+    limited = client.get("/api/products")
+    assert limited.headers["Retry-After"] == "5"
+    assert limited.json()["error"]["code"] == 429
+    assert client.get("/api/products", headers={"X-API-Key": "partner"}).status_code == 200
+
+    limiter.backend.clear()
+    assert [client.get("/api/products/1").status_code for _ in range(11)].count(200) == 10
+
+def test_unknown_api_keys_are_limited_by_ip():
+    limiter = RateLimiter(InMemoryTokenBuckets(clock=FakeClock()), rate=1, burst=10,
+                          route_costs={"GET /api/products": 5}, api_keys={"partner"})
+    client = TestClient(RateLimitMiddleware(make_app(), limiter))
+    statuses = [client.get("/api/products", headers={"X-API-Key": f"made-up-{i}"}).status_code for i in range(3)]
+    assert statuses == [200, 200, 429]  # rotating keys draws from the one IP bucket
+
+def scope(peer, forwarded=None, api_key=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    headers += [(b"x-api-key", api_key.encode())] if api_key else []
+    return {"client": (peer, 50000), "headers": headers}
+
+def test_forwarded_for_is_only_read_from_trusted_proxies():
+    proxies = _networks(["10.0.0.0/8"])
+    assert client_key(scope("203.0.113.7", "198.51.100.1")) == "ip:203.0.113.7"
+    assert client_key(scope("203.0.113.7", "198.51.100.1"), trusted_proxies=proxies) == "ip:203.0.113.7"
+    assert client_key(scope("10.0.0.2", "198.51.100.1"), trusted_proxies=proxies) == "ip:198.51.100.1"
+    # The client can prepend anything; the hop the first trusted proxy saw is the one that counts
+    assert client_key(scope("10.0.0.2", "1.2.3.4, 198.51.100.1, 10.0.0.3"), trusted_proxies=proxies) == "ip:198.51.100.1"
+    assert client_key(scope("10.0.0.2", api_key="partner"), {"partner"}, proxies) == "key:partner"
+
+def test_overload_sheds_everything_but_checkout():
+    shed = LoadShedMiddleware(make_app(), max_in_flight=2, max_pool_wait_ms=0, exempt={"POST /api/orders"})
+    client = TestClient(shed)
+    assert client.get("/api/products").status_code == 200
+    shed.in_flight = 2  # two requests still running
+    response = client.get("/api/products")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.post("/api/orders").status_code == 200
+
+def test_slow_pool_checkouts_shed_load():
+    pool_metrics.get_stats("shed-test").record_wait(0.5)
+    client = TestClient(LoadShedMiddleware(make_app(), max_in_flight=0, max_pool_wait_ms=100, pool="shed-test"))
+    assert client.get("/api/products").status_code == 503
+    calm = TestClient(LoadShedMiddleware(make_app(), max_in_flight=0, max_pool_wait_ms=1000, pool="shed-test"))
+    assert calm.get("/api/products").status_code == 200
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.replicas import PRIMARY_COOKIE, ReadYourWritesMiddleware, ReplicaRouter, open_read_session, pinned_to_primary
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_engine(path, product_name):
+    # Each database holds one product named after it, so a read shows where it was served from
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(models.Product(name=product_name, price=1, quantity=1))
+        db.commit()
+    return engine
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = make_engine(tmp_path / "primary.db", "primary")
+    replicas = [make_engine(tmp_path / "replica-a.db", "replica-a"), make_engine(tmp_path / "replica-b.db", "replica-b")]
+    yield primary, replicas
+    for engine in [primary, *replicas]:
+        engine.dispose()
+
+def served_by(router, pin_to_primary=False):
+    with open_read_session(router, sessionmaker(autoflush=False), pin_to_primary) as db:
+        return db.query(models.Product.name).scalar()
+
+def test_reads_rotate_across_replicas(engines):
+    primary, replicas = engines
+    router = ReplicaRouter(primary, replicas)
+    assert [served_by(router) for _ in range(4)] == ["replica-a", "replica-b", "replica-a", "replica-b"]
+
+def test_unreachable_replica_is_skipped_until_retry(engines, tmp_path):
+    primary, replicas = engines
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    clock = FakeClock()
+    router = ReplicaRouter(primary, [broken, replicas[0]], retry_after=30, clock=clock)
+    assert served_by(router) == "replica-a"
+    assert router.stats()["down"] == [0]
+    assert router.candidates() == [replicas[0], primary]
+    clock.now = 30
+    assert router.candidates()[0] is broken
+
+def test_all_replicas_down_falls_back_to_primary(engines, tmp_path):
+    primary, _ = engines
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReplicaRouter(primary, [broken])
+    assert served_by(router) == "primary"
+
+def test_pinned_reads_go_to_primary(engines):
+    primary, replicas = engines
+    router = ReplicaRouter(primary, replicas)
+    assert served_by(router, pin_to_primary=True) == "primary"
+
+def test_successful_writes_pin_the_client_to_the_primary():
+    app = FastAPI()
+
+    @app.post("/write")
+    def write():
+        return {}
+
+    @app.post("/conflict")
+    def conflict():
+        raise HTTPException(status_code=409)
+
+    @app.get("/read")
+    def read(request: Request):
+        return {"pinned": pinned_to_primary(request.cookies)}
+
+    app.add_middleware(ReadYourWritesMiddleware, window=5)
+    client = TestClient(app)
+    assert client.get("/read").json() == {"pinned": False}
+    client.post("/conflict")
+    assert client.get("/read").json() == {"pinned": False}
+    client.post("/write")
+    assert client.get("/read").json() == {"pinned": True}
+
+def test_expired_or_garbled_cookie_is_not_pinned():
+    assert not pinned_to_primary({PRIMARY_COOKIE: str(time.time() - 1)})
+    assert not pinned_to_primary({PRIMARY_COOKIE: "nonsense"})
+    assert pinned_to_primary({PRIMARY_COOKIE: str(time.time() + 5)})
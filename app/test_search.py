@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+
+
+@pytest.fixture
+def db():
+    # SQLite exercises the FTS5 fallback; Postgres uses the tsvector GIN index
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    session.add_all([
+        models.Product(name="Red shirt", description="Cotton shirt, shirt of the year", price=8, quantity=3),
+        models.Product(name="Blue jeans", description="Denim that goes with any shirt", price=40, quantity=1),
+        models.Product(name="Wool hat", description=None, price=300, quantity=2),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_search_ranks_best_match_first(db):
+    result = crud.search_products(db, "shirt")
+    assert result.total == 2
+    assert [item.name for item in result.items] == ["Red shirt", "Blue jeans"]
+
+def test_search_facets_count_the_whole_match_set(db):
+    result = crud.search_products(db, "shirt", limit=1)
+    assert len(result.items) == 1
+    assert result.facets.status == {"available": 2}
+    price_counts = {(facet.min, facet.max): facet.count for facet in result.facets.price}
+    assert price_counts[(None, 10.0)] == 1
+    assert price_counts[(25.0, 50.0)] == 1
+    assert price_counts[(250.0, None)] == 0
+
+def test_search_applies_filters(db):
+    result = crud.search_products(db, "shirt", schemas.ProductFilters(min_price=20))
+    assert [item.name for item in result.items] == ["Blue jeans"]
+
+def test_search_index_follows_renames(db):
+    hat = db.query(models.Product).filter(models.Product.name == "Wool hat").one()
+    hat.name = "Wool shirt"
+    db.commit()
+    assert crud.search_products(db, "shirt").total == 3
+    assert crud.search_products(db, "hat").total == 0
+
+@pytest.mark.parametrize("q", ["", "   "])
+def test_blank_search_is_rejected(client, q):
+    response = client.get("/api/products/search", params={"q": q})
+    assert response.status_code == 422
+
+def test_search_terms_are_stripped(client):
+    client.post("/api/products", json={"name": "Red shirt", "price": 8, "quantity": 3})
+    assert client.get("/api/products/search", params={"q": "  shirt "}).json()["total"] == 1
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    session.add_all([
+        models.Product(name="Plain", description=None, price=8, quantity=3),
+        models.Product(name="Dated", description="ünïcode \"quoted\"", price=19.99, quantity=0, status="Sold",
+                       created_at=datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone(timedelta(hours=3)))),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def validated_json(db):
+    """What FastAPI would emit through response_model=List[ProductResponse]."""
+    products = db.query(models.Product).order_by(models.Product.id).all()
+    return [schemas.ProductResponse.model_validate(p, from_attributes=True).model_dump(mode="json") for p in products]
+
+def test_row_schema_matches_response_model():
+    assert list(schemas.ProductRow.__annotations__) == list(schemas.ProductResponse.model_fields)
+
+def test_listing_body_matches_validated_output(db):
+    entry = crud._cached_listing_entry(crud.get_all_products(db), limit=2)
+    items = json.loads(entry["body"])
+    assert items == validated_json(db)
+    assert [list(item) for item in items] == [list(item) for item in validated_json(db)]
+    assert entry["next_cursor"] == 2
+
+def test_ndjson_rows_match_validated_output(db):
+    lines = [json.loads(schemas.product_row_json.dump_json(crud.product_row(row))) for row in crud.iter_products(db)]
+    assert lines == validated_json(db)
@@ -0,0 +1,117 @@
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import config, crud, main, models, schemas, snapshot
+from app.outbox import EventPublisher, OutboxRelay
+from app.replicas import ReadYourWritesMiddleware
+from app.snapshot import CatalogSnapshot, SnapshotRefresher
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+@pytest.fixture
+def refresh(session_factory, tmp_path):
+    relay = OutboxRelay(EventPublisher(), session_factory)
+    refresher = SnapshotRefresher(str(tmp_path / "catalog.snapshot"), session_factory)
+
+    def refresh():
+        relay.relay_once()
+        return refresher.refresh_once()
+    return refresh
+
+@pytest.fixture
+def catalog(tmp_path):
+    return CatalogSnapshot(str(tmp_path / "catalog.snapshot"))
+
+def add_products(db, count):
+    return [crud.create_product(db, schemas.ProductCreate(name=f"Product {i}", price=1 + i % 7, quantity=5))
+            for i in range(count)]
+
+@pytest.mark.parametrize("filters, limit, cursor", [
+    (None, 10, None),
+    (None, 10, 10),
+    (schemas.ProductFilters(status="available"), 4, 2),
+    (schemas.ProductFilters(status="Sold"), 10, None),
+    (schemas.ProductFilters(status="Sold"), 10, 4),
+    (schemas.ProductFilters(status="unknown"), 10, None),
+])
+def test_listing_matches_the_database(session_factory, refresh, catalog, filters, limit, cursor):
+    with session_factory() as db:
+        products = add_products(db, 25)
+        crud.mark_product_sold(db, products[3].id)
+        crud.mark_product_sold(db, products[7].id)
+        refresh()
+        served = catalog.listing(filters, limit, cursor)
+        expected = crud._cached_listing_entry(crud.get_all_products(db, filters, limit, cursor), limit)
+    assert served == expected  # same body, ETag and next cursor
+
+def test_unsupported_filters_fall_back(session_factory, refresh, catalog):
+    with session_factory() as db:
+        add_products(db, 1)
+    refresh()
+    created_after = schemas.ProductFilters(created_after=datetime(2020, 1, 1, tzinfo=timezone.utc))
+    assert catalog.listing(created_after, 10, None) is None
+    assert catalog.listing(schemas.ProductFilters(min_price=3), 10, None) is None  # ranges use the DB index
+    assert len(catalog.prices([1, 2])) == 1
+
+def test_rebuilds_only_after_product_changes(session_factory, refresh, catalog):
+    with session_factory() as db:
+        product_id = add_products(db, 1)[0].id
+        assert refresh() is True
+        assert refresh() is False
+        crud.record_event(db, "payment.completed", 1, {})
+        db.commit()
+        assert refresh() is False  # not a product event
+        assert catalog.prices([product_id])[0]["quantity"] == 5
+
+        crud.create_order(db, schemas.OrderCreate(product_id=product_id, quantity=2))
+        assert refresh() is True
+    assert catalog.prices([product_id]) == [{"id": product_id, "price": 1.0, "quantity": 3, "status": "available"}]
+    assert catalog.stats()["generation"] == 2
+
+def test_stale_or_missing_snapshot_is_not_served(session_factory, refresh, tmp_path):
+    assert CatalogSnapshot(str(tmp_path / "missing.snapshot")).listing(None, 10, None) is None
+    with session_factory() as db:
+        add_products(db, 1)
+    refresh()
+    now = [datetime.now().timestamp()]
+    catalog = CatalogSnapshot(str(tmp_path / "catalog.snapshot"), max_age=10, clock=lambda: now[0])
+    assert catalog.listing(None, 10, None) is not None
+    now[0] += 11  # the refresher stopped checking in
+    assert catalog.listing(None, 10, None) is None
+
+def test_too_many_statuses_are_refused(tmp_path):
+    Row = namedtuple("Row", [*schemas.ProductRow.__annotations__, "version"])
+    blank = dict.fromkeys(Row._fields)
+    rows = (Row(**{**blank, "id": i, "price": 1.0, "quantity": 1, "version": 1, "status": f"status {i}"})
+            for i in range(snapshot.MAX_STATUSES + 1))
+    with pytest.raises(ValueError, match="distinct product statuses"):
+        snapshot.write_snapshot(str(tmp_path / "catalog.snapshot"), rows, 1)
+
+def test_refresher_survives_a_failed_refresh(session_factory, tmp_path, monkeypatch):
+    refresher = SnapshotRefresher(str(tmp_path / "catalog.snapshot"), session_factory, interval=0)
+    stop, calls = threading.Event(), []
+
+    def refresh_once():
+        calls.append(1)
+        if len(calls) == 3:
+            stop.set()
+        raise ValueError("More than 65536 distinct product statuses")
+    monkeypatch.setattr(refresher, "refresh_once", refresh_once)
+    refresher.run(stop)
+    assert len(calls) == 3
+
+def test_writers_are_pinned_when_the_snapshot_is_enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "DATABASE_REPLICA_URLS", [])
+    monkeypatch.setattr(config, "CATALOG_SNAPSHOT_PATH", str(tmp_path / "catalog.snapshot"))
+    assert any(m.cls is ReadYourWritesMiddleware for m in main.create_app().user_middleware)
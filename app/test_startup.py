@@ -0,0 +1,100 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app import async_database, main, models, outbox, payments, warmup
+
+ALEMBIC_INI = Path(__file__).resolve().parents[1] / "alembic.ini"
+
+
+@pytest.fixture
+def alembic_config(tmp_path):
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{tmp_path / 'migrations.db'}")
+    return config
+
+def test_migrations_match_the_models(alembic_config):
+    command.upgrade(alembic_config, "head")
+    command.check(alembic_config)  # raises if autogenerate would emit anything
+
+def test_migrations_downgrade_to_an_empty_database(alembic_config):
+    command.upgrade(alembic_config, "head")
+    command.downgrade(alembic_config, "base")
+    engine = create_engine(alembic_config.get_main_option("sqlalchemy.url"))
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+    engine.dispose()
+
+def test_baseline_database_upgrades_with_its_data(alembic_config):
+    command.upgrade(alembic_config, "0001")  # the schema create_all made before migrations existed
+    engine = create_engine(alembic_config.get_main_option("sqlalchemy.url"))
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO products (name, price, quantity, status) VALUES ('Red mug', 5, 3, 'available')"))
+        connection.execute(text("INSERT INTO orders (product_id, quantity, total_price) VALUES (1, 2, 10)"))
+
+    command.upgrade(alembic_config, "head")
+    with engine.begin() as connection:
+        assert connection.execute(text("SELECT version FROM products")).scalar() == 1
+        assert connection.execute(text("SELECT units, revenue FROM daily_product_sales")).one() == (2, 10.0)
+        connection.execute(text("INSERT INTO products (name, price, quantity) VALUES ('Blue mug', 5, 3)"))
+        matches = connection.execute(text("SELECT rowid FROM products_fts WHERE products_fts MATCH 'mug'")).scalars()
+        assert sorted(matches) == [1, 2]  # existing rows re-indexed, triggers in place for new ones
+    engine.dispose()
+
+def test_partially_created_database_upgrades_after_stamping(alembic_config):
+    # Stands in for create_all at an intermediate version: some of the later tables and columns exist
+    command.upgrade(alembic_config, "head")
+    command.stamp(alembic_config, "0001")
+    command.upgrade(alembic_config, "head")
+    command.check(alembic_config)
+
+def test_worker_is_live_before_the_database_is_ready(monkeypatch):
+    attempts = []
+
+    def warm_sync_pool():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+    async def ping():
+        pass
+
+    monkeypatch.setattr(warmup, "warm_sync_pool", warm_sync_pool)
+    monkeypatch.setattr(warmup, "ping", ping)
+    monkeypatch.setattr(payments.worker, "recover_pending", lambda: None)
+    monkeypatch.setattr(outbox.relay, "start", lambda: None)
+
+    with TestClient(main.create_app()) as client:
+        assert client.get("/health/live").status_code == 200
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "starting"
+
+        deadline = time.monotonic() + 5
+        while client.get("/health/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert client.get("/health/ready").json()["status"] == "ready"
+    assert len(attempts) == 3
+
+def test_warm_up_opens_the_whole_pool(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'warm.db'}"
+    engine = create_engine(url, poolclass=QueuePool, pool_size=3)
+    models.Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(url.replace("sqlite", "sqlite+aiosqlite"), poolclass=AsyncAdaptedQueuePool, pool_size=3)
+    monkeypatch.setattr(warmup, "engine", engine)
+    monkeypatch.setattr(async_database, "async_engine", async_engine)
+
+    warmup.warm_sync_pool()
+    asyncio.run(warmup.warm_async_pool())
+    assert engine.pool.checkedin() == engine.pool.size() == 3
+    assert async_engine.sync_engine.pool.checkedin() == 3
+    engine.dispose()
+    asyncio.run(async_engine.dispose())
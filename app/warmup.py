@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import config, crud, models, payments
+from .database import SessionLocal, engine, replica_engines
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """What GET /health/ready reports. Set once the warm-up has reached a migrated database."""
+
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+
+
+# ---------------------------- Warm-up ---------------------------- #
+
+def prepare_statements(db):
+    """Run the hot read paths once on `db`'s connection.
+
+    Their SQL lands in SQLAlchemy's compiled cache, and on asyncpg in the
+    connection's prepared statement cache, before the first request needs it.
+    """
+    db.get(models.Product, 0)
+    db.execute(crud._product_listing_query(None, config.DEFAULT_PAGE_SIZE, None)).all()
+    db.execute(crud._product_listing_query(None, config.DEFAULT_PAGE_SIZE, 0)).all()
+    db.get(models.Order, 0)
+    crud.get_events(db, after=2 ** 62, limit=1)
+    db.rollback()
+
+def _prefill_count(pool) -> int:
+    # QueuePool and its async variant; SQLite keeps its default single-connection pool
+    return pool.size() if config.DB_POOL_PREFILL and hasattr(pool, "size") else 1
+
+def warm_sync_pool():
+    """Check out the whole pool at once, so every connection is opened and primed.
+
+    Each session gets its own connection, held until all of them are primed:
+    a session's rollback would otherwise hand its connection straight back
+    for the next one to reuse.
+    """
+    connections = []
+    try:
+        for _ in range(_prefill_count(engine.pool)):
+            connections.append(engine.connect())
+            with SessionLocal(bind=connections[-1]) as db:
+                prepare_statements(db)
+    finally:
+        for connection in connections:
+            connection.close()
+
+async def warm_async_pool():
+    """warm_sync_pool for the async engine; run_sync drives the same queries through asyncpg."""
+    from .async_database import AsyncSessionLocal, async_engine
+
+    connections = []
+    try:
+        for _ in range(_prefill_count(async_engine.sync_engine.pool)):
+            connections.append(await async_engine.connect())
+            async with AsyncSessionLocal(bind=connections[-1]) as db:
+                await db.run_sync(prepare_statements)
+    finally:
+        for connection in connections:
+            await connection.close()
+
+async def warm_up(readiness: Readiness):
+    """Prime the pool, then requeue pending payments, then report ready.
+
+    Runs as a background task of the app lifespan, so a worker starts serving
+    /health/live at once and retries here (with backoff) instead of crashing
+    while Postgres is still starting or migrations haven't run yet.
+    """
+    started = time.perf_counter()
+    delay = 0.1
+    while True:
+        try:
+            if config.DB_MODE == "async":
+                await warm_async_pool()
+            # The sync pool also serves the payment worker, the outbox relay and sync-only routes
+            await run_in_threadpool(warm_sync_pool)
+            await run_in_threadpool(payments.worker.recover_pending)
+            break
+        except SQLAlchemyError as exc:
+            readiness.error = str(getattr(exc, "orig", None) or exc)
+            logger.warning(f"Database not ready ({readiness.error}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, config.STARTUP_RETRY_MAX_SECONDS)
+
+    readiness.warmup_seconds = round(time.perf_counter() - started, 3)
+    readiness.error = None
+    readiness.ready = True
+    logger.info(f"Warm-up finished in {readiness.warmup_seconds}s")
+
+
+# ---------------------------- Health Checks ---------------------------- #
+
+def _ping():
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+async def ping():
+    """Round-trip to the primary through the pool requests use."""
+    if config.DB_MODE == "async":
+        from .async_database import async_engine
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    else:
+        await run_in_threadpool(_ping)
+
+
+# ---------------------------- Shutdown ---------------------------- #
+
+async def dispose_engines():
+    if config.DB_MODE == "async":
+        from .async_database import async_engine, async_replica_engines
+        for async_db_engine in [async_engine, *async_replica_engines]:
+            await async_db_engine.dispose()
+    for db_engine in [engine, *replica_engines]:
+        db_engine.dispose()
@@ -0,0 +1,4 @@
+"""Benchmarks. Each bench_*.py module is a standalone comparison; the load test
+(seed.py, scenarios.py, loadtest.py) drives the whole app and guards against
+regressions. Run any of them with python -m benchmarks.<module> --help.
+"""
@@ -0,0 +1,69 @@
+"""Throughput of the payment worker against the fake provider at various worker counts.
+
+Each run records N pending payments, then measures how long the worker pool
+takes to settle them. With a provider latency of L ms a single worker tops
+out near 1000/L payments/s; the point is to see how far threads scale it
+before the database becomes the limit.
+
+    python -m benchmarks.bench_payments --payments 2000 --latency-ms 50 --workers 1 4 16 64
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_payments.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--payments", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", args.database_url)
+    from app import crud, models, schemas
+    from app.payments import FakePaymentProvider, PaymentWorker
+
+    engine = create_engine(args.database_url, connect_args={"timeout": 60} if args.database_url.startswith("sqlite") else {})
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        db.execute(delete(models.Payment))
+        db.commit()
+        order = db.query(models.Order).first()
+        if order is None:
+            product = models.Product(name="Bench product", price=10, quantity=1)
+            order = models.Order(product=product, quantity=1, total_price=10)
+            db.add(order)
+            db.commit()
+        order_id = order.id
+
+    print(f"{'workers':>8} {'payments/s':>12} {'seconds':>10}")
+    for workers in args.workers:
+        with Session() as db:
+            db.execute(delete(models.Payment))
+            db.commit()
+            ids = [crud.create_payment(db, schemas.PaymentRequest(order_id=order_id, amount=10, payment_method="stripe"))[0].id
+                   for _ in range(args.payments)]
+
+        worker = PaymentWorker(FakePaymentProvider(latency_ms=args.latency_ms), Session, workers=workers)
+        started = time.perf_counter()
+        worker.start()
+        for payment_id in ids:
+            worker.enqueue(payment_id)
+        worker.queue.join()
+        elapsed = time.perf_counter() - started
+        worker.stop()
+        print(f"{workers:>8} {args.payments / elapsed:>12.1f} {elapsed:>10.2f}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare serializing product listings through response_model against the row fast path.
+
+"response_model" loads Product entities and does what FastAPI does for
+response_model=List[ProductResponse]: validate every object, dump it to
+JSON-able python, then json.dumps the result. "rows" selects the listing
+columns and dumps them with the compiled ProductRow TypeAdapter, as
+GET /api/products now does. Both outputs are checked to be identical.
+
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --rows 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+DEFAULT_DATABASE_URL = "sqlite://"
+
+
+def seed(db, models, count):
+    db.execute(insert(models.Product), [
+        {"name": f"Product {i}", "description": "benchmark row" if i % 3 else None,
+         "price": 1 + i % 500 + 0.99, "quantity": i % 20, "status": "available"}
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", args.database_url)
+    from app import crud, models, schemas  # imported late so DATABASE_URL above is honoured
+
+    validated_list = TypeAdapter(list[schemas.ProductResponse])
+    engine = create_engine(args.database_url)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        seed(db, models, max(args.rows))
+
+        print(f"{'rows':>8}  {'response_model':>15}  {'rows+TypeAdapter':>16}  {'speedup':>8}")
+        for count in args.rows:
+            def response_model_path():
+                db.expunge_all()
+                products = db.scalars(select(models.Product).order_by(models.Product.id).limit(count)).all()
+                items = validated_list.validate_python(products, from_attributes=True)
+                return json.dumps(validated_list.dump_python(items, mode="json"), ensure_ascii=False,
+                                  separators=(",", ":")).encode()
+
+            def row_path():
+                rows = db.execute(select(*crud.PRODUCT_LISTING_COLUMNS).order_by(models.Product.id).limit(count)).all()
+                return schemas.product_rows_json.dump_json([crud.product_row(row) for row in rows])
+
+            slow, slow_body = best_of(args.repeat, response_model_path)
+            fast, fast_body = best_of(args.repeat, row_path)
+            assert json.loads(slow_body) == json.loads(fast_body)
+            print(f"{count:>8}  {slow * 1000:>13.1f}ms  {fast * 1000:>14.1f}ms  {slow / fast:>7.1f}x")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
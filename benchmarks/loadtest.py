@@ -0,0 +1,192 @@
+"""Load-test the app through scripted scenarios and compare per-route latency with a baseline.
+
+Virtual users (--concurrency of them) loop over the scenarios in
+scenarios.py, picked at random by --mix weights, for --duration seconds
+after a --warmup period that is not recorded. The report lists throughput
+and p50/p95/p99 per route. By default the app is started here with uvicorn
+on --database-url, with rate limiting off; pass --url to test a running
+deployment instead. Seed the database first with benchmarks.seed.
+
+With --baseline, the run is compared to a saved run and the exit status is 1
+when any route's p50, p95 or p99 grew, or overall throughput fell, by more
+than --threshold percent. Changes smaller than --min-delta-ms are noise and
+never count. Baselines are only comparable on the same machine, data and
+settings.
+
+    python -m benchmarks.seed --products 10000 --orders 200000
+    python -m benchmarks.loadtest --duration 30 --save-baseline baseline.json
+    python -m benchmarks.loadtest --duration 30 --baseline baseline.json      # after a change
+    python -m benchmarks.loadtest --mode async --mix browse=1,search=1 --concurrency 128
+    python -m benchmarks.loadtest --workers 4 --snapshot    # catalog served from the shared snapshot
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_db_modes import DEFAULT_DATABASE_URL, migrate, percentile, start_server, wait_until_up
+from benchmarks.scenarios import DEFAULT_MIX, SCENARIOS, Recorder, load_catalog, parse_mix
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+# ---------------------------- Driving ---------------------------- #
+
+def start_refresher(database_url):
+    """Run the catalog snapshot refresher; servers started afterwards serve from its file."""
+    os.environ["CATALOG_SNAPSHOT_PATH"] = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+    return subprocess.Popen([sys.executable, "-m", "app.snapshot"], env=dict(os.environ, DATABASE_URL=database_url))
+
+async def virtual_user(client, recorder, catalog, mix, rng, stop_at):
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < stop_at:
+        scenario = SCENARIOS[rng.choices(names, weights)[0]]
+        await scenario(client, recorder, catalog, rng)
+
+
+async def drive(url, mix, concurrency, duration, warmup, seed):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        await wait_until_up(client)
+        catalog = await load_catalog(client)
+        recorder = Recorder()
+        users = [random.Random(seed + i) for i in range(concurrency)]
+
+        async def run_for(seconds):
+            stop_at = time.monotonic() + seconds
+            await asyncio.gather(*(virtual_user(client, recorder, catalog, mix, rng, stop_at) for rng in users))
+
+        if warmup:
+            recorder.recording = False
+            await run_for(warmup)
+            recorder.recording = True
+        started = time.perf_counter()
+        await run_for(duration)
+        return summarize(recorder, time.perf_counter() - started)
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for route in sorted(set(recorder.latencies) | set(recorder.errors) | set(recorder.rejected)):
+        samples = recorder.latencies.get(route, [])
+        routes[route] = {
+            "requests": len(samples),
+            "rps": round(len(samples) / elapsed, 2),
+            **{metric: round(percentile(samples, pct) * 1000, 3) if samples else None
+               for metric, pct in zip(METRICS, (50, 95, 99))},
+            "errors": recorder.errors[route],
+            "rejected": recorder.rejected[route],
+            "conflicts": recorder.conflicts[route],
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {"duration_s": round(elapsed, 2), "throughput_rps": round(total / elapsed, 2), "routes": routes}
+
+
+# ---------------------------- Baseline ---------------------------- #
+
+def compare(result, baseline, threshold, min_delta_ms):
+    """Regressions of `result` against `baseline`, as printable lines."""
+    regressions = []
+    limit = 1 + threshold / 100
+    for route, before in baseline["routes"].items():
+        after = result["routes"].get(route)
+        if after is None or not after["requests"]:
+            regressions.append(f"{route}: no successful requests (baseline had {before['requests']})")
+            continue
+        for metric in METRICS:
+            old, new = before[metric], after[metric]
+            if old is not None and new is not None and new > old * limit and new - old > min_delta_ms:
+                regressions.append(f"{route} {metric[:3]}: {old:.2f} -> {new:.2f} ms (+{(new / old - 1) * 100:.0f}%)")
+        if after["errors"] and not before["errors"]:
+            regressions.append(f"{route}: {after['errors']} errors (baseline had none)")
+    old, new = baseline["throughput_rps"], result["throughput_rps"]
+    if new * limit < old:
+        regressions.append(f"throughput: {old:.1f} -> {new:.1f} req/s ({(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(result, baseline=None):
+    print(f"{'route':<32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'429/503':>8}"
+          + (f" {'p95 vs base':>12}" if baseline else ""))
+    for route, stats in result["routes"].items():
+        line = (f"{route:<32} {stats['rps']:>9.1f} " + " ".join(
+            f"{stats[metric]:>9.2f}" if stats[metric] is not None else f"{'-':>9}" for metric in METRICS)
+            + f" {stats['errors']:>7} {stats['rejected']:>8}")
+        before = baseline["routes"].get(route) if baseline else None
+        if before and before["p95_ms"] and stats["p95_ms"] is not None:
+            line += f" {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:>+11.0f}%"
+        print(line)
+    print(f"\n{result['throughput_rps']:.1f} req/s over {result['duration_s']:.0f}s"
+          + (f" (baseline {baseline['throughput_rps']:.1f})" if baseline else ""))
+
+
+# ---------------------------- CLI ---------------------------- #
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--url", help="test this running server instead of starting one")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="DB_MODE of the started server")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--port", type=int, default=8785)
+    parser.add_argument("--snapshot", action="store_true", help="run a catalog snapshot refresher for the started server")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds recorded")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run before recording")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the virtual users")
+    parser.add_argument("--baseline", help="compare against this saved run")
+    parser.add_argument("--save-baseline", help="write this run's results here")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed slowdown, in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    settings = {"mix": mix, "concurrency": args.concurrency, "duration": args.duration,
+                "mode": None if args.url else args.mode, "workers": None if args.url else args.workers,
+                "snapshot": None if args.url else args.snapshot}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print(f"warning: baseline was recorded with different settings: {baseline.get('settings')}\n")
+
+    processes = []
+    if not args.url:
+        migrate(args.database_url)
+        if args.snapshot:
+            processes.append(start_refresher(args.database_url))
+        processes.append(start_server(args.mode, args.port, args.database_url, args.workers))
+    try:
+        result = asyncio.run(drive(args.url or f"http://127.0.0.1:{args.port}", mix, args.concurrency,
+                                   args.duration, args.warmup, args.seed))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print_report(result, baseline)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"settings": settings, **result}, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+    if baseline:
+        regressions = compare(result, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.threshold:g}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Scripted user journeys for the load test.
+
+Each scenario is one visit: a coroutine issuing a few requests in the
+order a real client would. Requests are recorded under their route
+template ("GET /api/products/{id}"), so per-route numbers from different
+ids add up.
+"""
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks.seed import DEFAULT_CUSTOMERS, SEARCH_TERMS
+
+
+class Recorder:
+    """Per-route latencies of answered requests, plus counts of the ones that were not."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # route -> seconds, for responses below 500
+        self.errors = Counter()  # route -> 5xx responses and transport failures
+        self.rejected = Counter()  # route -> 429/503 from rate limiting and load shedding
+        self.conflicts = Counter()  # route -> 409s, e.g. a product sold out mid-run
+        self.recording = True  # off during warm-up
+
+    async def request(self, client: httpx.AsyncClient, method: str, route: str, path: str = None, **kwargs):
+        """Send `method` to `path` (default: `route` itself) and record it under `route`."""
+        label = f"{method} {route}"
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path or route, **kwargs)
+        except httpx.TransportError:
+            if self.recording:
+                self.errors[label] += 1
+            return None
+        elapsed = time.perf_counter() - started
+        if self.recording:
+            if response.status_code >= 500 and response.status_code != 503:
+                self.errors[label] += 1
+            elif response.status_code in (429, 503):
+                self.rejected[label] += 1
+            else:
+                self.latencies[label].append(elapsed)
+                if response.status_code == 409:
+                    self.conflicts[label] += 1
+        return response if response.status_code < 400 else None
+
+
+async def view_product(client, recorder, product_id):
+    return await recorder.request(client, "GET", "/api/products/{id}", f"/api/products/{product_id}")
+
+
+async def browse(client, recorder, catalog, rng):
+    """First catalog page, the next one, then two product pages."""
+    page = await recorder.request(client, "GET", "/api/products", params={"limit": 50})
+    if page is not None and page.headers.get("X-Next-Cursor"):
+        await recorder.request(client, "GET", "/api/products",
+                               params={"limit": 50, "cursor": page.headers["X-Next-Cursor"]})
+    for _ in range(2):
+        await view_product(client, recorder, rng.choice(catalog))
+
+
+async def search(client, recorder, catalog, rng):
+    """A search, then the top hit."""
+    results = await recorder.request(client, "GET", "/api/products/search", params={"q": rng.choice(SEARCH_TERMS)})
+    items = results.json()["items"] if results is not None else []
+    await view_product(client, recorder, items[0]["id"] if items else rng.choice(catalog))
+
+
+async def history(client, recorder, catalog, rng):
+    """A customer's recent orders with their products and payments, then the page before."""
+    route = "/api/customers/{id}/orders"
+    path = f"/api/customers/{rng.randint(1, DEFAULT_CUSTOMERS)}/orders"
+    params = {"limit": 20, "expand": "product,payments"}
+    page = await recorder.request(client, "GET", route, path, params=params)
+    if page is not None and page.headers.get("X-Next-Cursor"):
+        await recorder.request(client, "GET", route, path, params={**params, "cursor": page.headers["X-Next-Cursor"]})
+
+
+async def checkout(client, recorder, catalog, rng):
+    """View a product and order it. Returns the order, or None if it was not placed."""
+    product_id = rng.choice(catalog)
+    await view_product(client, recorder, product_id)
+    order = await recorder.request(client, "POST", "/api/orders", json={
+        "product_id": product_id, "quantity": rng.choice((1, 1, 2, 3)), "customer_id": rng.randint(1, DEFAULT_CUSTOMERS)})
+    return order.json() if order is not None else None
+
+
+async def pay(client, recorder, catalog, rng):
+    """Checkout, pay with an Idempotency-Key, then poll the payment once."""
+    order = await checkout(client, recorder, catalog, rng)
+    if order is None:
+        return
+    payment = await recorder.request(
+        client, "POST", "/api/payments",
+        json={"order_id": order["id"], "amount": order["total_price"], "payment_method": rng.choice(("stripe", "paypal", "mpesa"))},
+        headers={"Idempotency-Key": str(uuid.uuid4())},  # unique across runs, or payments would replay
+    )
+    if payment is not None:
+        await recorder.request(client, "GET", "/api/payments/{id}", f"/api/payments/{payment.json()['id']}")
+
+
+SCENARIOS = {"browse": browse, "search": search, "history": history, "checkout": checkout, "pay": pay}
+# Mostly reads, like a shop's real traffic
+DEFAULT_MIX = "browse=55,search=20,history=5,checkout=15,pay=5"
+
+
+def parse_mix(spec: str):
+    """ "browse=60,search=20" -> {"browse": 60.0, "search": 20.0}"""
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def load_catalog(client, limit=2000):
+    """Product ids to visit, read through the API so the load test also works against a remote --url."""
+    ids, cursor = [], None
+    while len(ids) < limit:
+        params = {"limit": 500, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/products", params=params)
+        response.raise_for_status()
+        ids.extend(product["id"] for product in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    if not ids:
+        raise SystemExit("No products found; seed the database first (python -m benchmarks.seed)")
+    return ids[:limit]
@@ -0,0 +1,50 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from app import config, models
+
+if context.config.config_file_name is not None:
+    fileConfig(context.config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = models.Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # The SQLite FTS5 table and its shadow tables are managed by raw DDL, not the models
+    return not (type_ == "table" and name.startswith("products_fts"))
+
+
+def database_url():
+    # Tests and scripts may pass a URL in the Alembic config; otherwise use the app's
+    return context.config.get_main_option("sqlalchemy.url") or config.DATABASE_URL
+
+
+def run_migrations_offline():
+    """Emit the SQL as a script (alembic upgrade head --sql) without connecting."""
+    context.configure(url=database_url(), target_metadata=target_metadata, literal_binds=True,
+                      dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_engine(database_url())
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite can't ALTER most things; later migrations get copy-and-move batches
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,75 @@
+"""baseline schema
+
+The products, orders and payments tables exactly as main.py created them
+with metadata.create_all before migrations existed. A database created that
+way, at any point before migrations were introduced, is marked as being at
+this revision and then upgraded:
+
+    alembic stamp 0001 && alembic upgrade head
+
+Later revisions check for what they add, since create_all at an
+intermediate version already created some tables, but never added columns.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 19:09:10.261555
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('products',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_products_id', 'products', ['id'])
+
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('total_price', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_orders_id', 'orders', ['id'])
+
+    op.create_table('payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('payment_method', sa.String(), nullable=False),
+    sa.Column('amount_paid', sa.Float(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'completed', 'failed', name='paymentstatusenum'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_payments_id', 'payments', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('payments')
+    op.drop_table('orders')
+    op.drop_table('products')
+    if op.get_bind().dialect.name == 'postgresql':
+        sa.Enum(name='paymentstatusenum').drop(op.get_bind(), checkfirst=True)
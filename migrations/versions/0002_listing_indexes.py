@@ -0,0 +1,40 @@
+"""listing indexes
+
+Indexes behind keyset-paginated, filtered product and order listings.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 22:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_products_price', 'products', ['price']),
+    ('ix_products_created_at', 'products', ['created_at']),
+    ('ix_products_status_id', 'products', ['status', 'id']),
+    ('ix_orders_created_at', 'orders', ['created_at']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases created by create_all after listings were added already have them
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
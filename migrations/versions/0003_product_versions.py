@@ -0,0 +1,50 @@
+"""product versions
+
+Adds products.updated_at and products.version, which ETags are derived
+from. Existing products start at version 1.
+
+On SQLite the column with a CURRENT_TIMESTAMP default can only be added by
+rebuilding the table, which drops the search triggers; 0005 reinstalls them.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 22:41:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _batch(table):
+    # SQLite can't ALTER TABLE ADD COLUMN with a non-constant default; rebuild the table instead
+    return op.batch_alter_table(table, recreate='always' if op.get_bind().dialect.name == 'sqlite' else 'auto')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('products')}
+    missing = [column for column in (
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    ) if column.name not in existing]
+    if missing:
+        with _batch('products') as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+    op.execute("UPDATE products SET version = 1 WHERE version IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with _batch('products') as batch_op:
+        batch_op.drop_column('version')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,46 @@
+"""payment idempotency
+
+Adds the columns payments need to be settled by the worker:
+idempotency_key (unique), failure_reason and updated_at.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 22:42:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _batch(table):
+    # SQLite can't ALTER TABLE ADD COLUMN with a non-constant default; rebuild the table instead
+    return op.batch_alter_table(table, recreate='always' if op.get_bind().dialect.name == 'sqlite' else 'auto')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('payments')}
+    if 'idempotency_key' in existing:
+        return  # created by create_all with all three columns
+    with _batch('payments') as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('failure_reason', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True))
+        batch_op.create_unique_constraint('uq_payments_idempotency_key', ['idempotency_key'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with _batch('payments') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('failure_reason')
+        batch_op.drop_column('idempotency_key')
@@ -0,0 +1,63 @@
+"""product search
+
+Full-text search over product names and descriptions: a GIN index on
+Postgres, an FTS5 table kept in sync by triggers on SQLite. The FTS table
+is (re)filled from the existing products.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 22:43:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same statements models.py attaches to the products table for SQLite. IF NOT
+# EXISTS, since databases created by create_all may have them, minus the
+# triggers 0003 dropped when it rebuilt the table.
+SQLITE_SEARCH = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(name, description, content='products', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    # Re-index every existing product from the content table
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+)
+POSTGRES_SEARCH = (
+    "CREATE INDEX IF NOT EXISTS ix_products_search ON products USING gin "
+    "(to_tsvector('english'::regconfig, coalesce(name, '') || ' ' || coalesce(description, '')))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(POSTGRES_SEARCH)
+    elif op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_SEARCH:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_search')
+    elif op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('products_fts_insert', 'products_fts_delete', 'products_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS products_fts')
@@ -0,0 +1,70 @@
+"""sales rollups
+
+Daily sales and payment rollups behind the analytics endpoints. When the
+tables are new they are backfilled from existing orders and settled
+payments, the same way crud.rebuild_rollups does.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 22:44:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table('daily_product_sales'):
+        return  # created by create_all and kept up to date since
+    sales = op.create_table('daily_product_sales',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    payment_stats = op.create_table('daily_payment_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('amount_completed', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+    orders = sa.table('orders', sa.column('product_id'), sa.column('quantity'), sa.column('total_price'),
+                      sa.column('created_at'))
+    order_day = sa.func.date(orders.c.created_at)
+    op.execute(sales.insert().from_select(
+        ['day', 'product_id', 'orders', 'units', 'revenue'],
+        sa.select(order_day, orders.c.product_id, sa.func.count(), sa.func.sum(orders.c.quantity),
+                  sa.func.sum(orders.c.total_price))
+        .group_by(order_day, orders.c.product_id),
+    ))
+
+    payments = sa.table('payments', sa.column('status'), sa.column('amount_paid'), sa.column('created_at'))
+    payment_day = sa.func.date(payments.c.created_at)
+    completed = payments.c.status == 'completed'
+    op.execute(payment_stats.insert().from_select(
+        ['day', 'completed', 'failed', 'amount_completed'],
+        sa.select(payment_day, sa.func.sum(sa.case((completed, 1), else_=0)), sa.func.sum(sa.case((completed, 0), else_=1)),
+                  sa.func.sum(sa.case((completed, payments.c.amount_paid), else_=0.0)))
+        .where(payments.c.status.in_(['completed', 'failed']))
+        .group_by(payment_day),
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_payment_stats')
+    op.drop_table('daily_product_sales')
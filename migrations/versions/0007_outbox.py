@@ -0,0 +1,58 @@
+"""outbox
+
+The transactional outbox: change events written with each change, and the
+single cursor row relays lock to number them.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 22:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('outbox_events'):
+        op.create_table('outbox_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('sequence', sa.BigInteger(), nullable=True),
+        sa.Column('topic', sa.String(length=32), nullable=False),
+        sa.Column('type', sa.String(length=64), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('published_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sequence')
+        )
+        op.create_index('ix_outbox_unpublished', 'outbox_events', ['id'],
+                        postgresql_where=sa.text('sequence IS NULL'), sqlite_where=sa.text('sequence IS NULL'))
+        op.create_index('ix_outbox_events_published_at', 'outbox_events', ['published_at'])
+    if not inspector.has_table('outbox_cursor'):
+        op.create_table('outbox_cursor',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('last_sequence', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    # The row every relay locks; created here so relays never race to insert it
+    cursor = sa.table('outbox_cursor', sa.column('id'), sa.column('last_sequence'))
+    if op.get_bind().scalar(sa.select(sa.func.count()).select_from(cursor)) == 0:
+        op.bulk_insert(cursor, [{'id': 1, 'last_sequence': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('outbox_cursor')
+    op.drop_table('outbox_events')
@@ -0,0 +1,53 @@
+"""order history indexes
+
+Adds orders.customer_id, and indexes for the foreign keys eager loads go
+through (orders.product_id, payments.order_id), a customer's order history
+and payments by date. On Postgres the indexes are built CONCURRENTLY, so
+existing orders and payments stay writable while they build.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:31:24.118905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_orders_customer_id_id', 'orders', ['customer_id', 'id']),
+    ('ix_orders_product_id', 'orders', ['product_id']),
+    ('ix_payments_order_id', 'payments', ['order_id']),
+    ('ix_payments_created_at', 'payments', ['created_at']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases first migrated before the baseline was split out already have it
+    if 'customer_id' not in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('orders')}:
+        op.add_column('orders', sa.Column('customer_id', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('customer_id')
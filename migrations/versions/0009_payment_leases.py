@@ -0,0 +1,35 @@
+"""payment leases
+
+Adds payments.lease_until: a worker claims a pending payment by setting it
+before calling the provider, so two processes never verify the same payment
+at once.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 09:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if 'lease_until' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('payments')}:
+        return  # created by create_all
+    op.add_column('payments', sa.Column('lease_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('payments') as batch_op:
+        batch_op.drop_column('lease_until')